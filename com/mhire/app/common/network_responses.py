@@ -1,7 +1,48 @@
 import time
 from typing import Dict, Any
+import orjson
 from fastapi.responses import JSONResponse
 
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (handles datetime and numpy values natively)"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+
+def elapsed_ms(start_time: float) -> int:
+    """Whole milliseconds elapsed since start_time (a time.perf_counter() reading)"""
+    return int((time.perf_counter() - start_time) * 1000)
+
+# Constant fragments of the success envelope, serialized once at import
+_SUCCESS_PREFIX = b'{"success":true,"message":'
+_DATA_KEY = b',"data":'
+_RESOURCE_KEY = b',"resource":'
+_DURATION_KEY = b',"duration_ms":'
+_ENVELOPE_END = b'}'
+
+class SuccessEnvelopeResponse(ORJSONResponse):
+    """
+    Success envelope assembled straight into bytes: only message, data and resource
+    go through orjson, the fixed keys are concatenated from precomputed fragments.
+    """
+
+    def __init__(self, message: str, data: Any, resource: str, start_time: float, status_code: int = 200):
+        self.message = message
+        self.resource = resource
+        self.start_time = start_time
+        super().__init__(content=data, status_code=status_code)
+
+    def render(self, content: Any) -> bytes:
+        return b"".join((
+            _SUCCESS_PREFIX, orjson.dumps(self.message),
+            _DATA_KEY, super().render(content),
+            _RESOURCE_KEY, orjson.dumps(self.resource),
+            _DURATION_KEY, str(elapsed_ms(self.start_time)).encode(),
+            _ENVELOPE_END
+        ))
+
 class NetworkResponse:
 
     def __init__(self, version=0.1):
@@ -9,32 +50,27 @@ class NetworkResponse:
 
     def success_response(
         self, http_code: int, message: str,data: Dict[str, Any], resource: str, start_time: float
-    ) -> JSONResponse:
-        duration = round(time.time() - start_time, 2)
+    ) -> SuccessEnvelopeResponse:
         # Serialize response data including any datetime objects
-        return JSONResponse(
-            status_code=http_code,
-            content={
-                "success": True,
-                "message": message,
-                "data": data,
-                "resource": resource,
-                "duration": f"{duration}s"
-            }
+        return SuccessEnvelopeResponse(
+            message=message,
+            data=data,
+            resource=resource,
+            start_time=start_time,
+            status_code=http_code
         )
 
     def json_response(
         self, http_code: int, error_message: str, resource: str, start_time: float
-    ) -> JSONResponse:
-        duration = round(time.time() - start_time, 2)
-        return JSONResponse(
+    ) -> ORJSONResponse:
+        return ORJSONResponse(
             status_code=http_code,
             content={
                 "code": http_code,
                 "success": False,
                 "message": error_message,
                 "resource": resource,
-                "duration": f"{duration}s"
+                "duration_ms": elapsed_ms(start_time)
             }
         )
 
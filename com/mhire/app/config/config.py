@@ -1,33 +1,74 @@
 import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
 from dotenv import load_dotenv
-            
-load_dotenv()
 
+@dataclass(frozen=True, slots=True)
 class Config:
-    _instance = None
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(Config, cls).__new__(cls)
-            # Face++ API settings
-            cls._instance.google_application_credential = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-            cls._instance.project_id = os.getenv("PROJECT_ID")
-            cls._instance.location = os.getenv("LOCATION")
-            cls._instance.processor_id = os.getenv("PROCESSOR_ID")
-            cls._instance.processor_version = os.getenv("PROCESSOR_VERSION")
-
-            cls._instance.openai_api_key = os.getenv("OPENAI_API_KEY")
-            cls._instance.openai_model = os.getenv("OPENAI_MODEL")
-            cls._instance.openai_api_base = os.getenv("OPENAI_API_BASE")
-
-            # Embedding Configuration
-            cls._instance.embedding_model = os.getenv("EMBEDDING_MODEL")
-
-            cls._instance.mongodb_uri = os.getenv("MONGODB_BASE_URL")
-            cls._instance.mongodb_db = os.getenv("MONGODB_NAME")
-            cls._instance.mongodb_collection = os.getenv("MONGODB_COLLECTION")
-            cls._instance.index_name = os.getenv("INDEX_NAME")
-            cls._instance.vector_search_type = os.getenv("VECTOR_SEARCH_TYPE")
-            cls._instance.index_fields = os.getenv("INDEX_FIELDS")
-
-        return cls._instance
\ No newline at end of file
+    # Google Document AI settings
+    google_application_credential: Optional[str] = None
+    project_id: Optional[str] = None
+    location: Optional[str] = None
+    processor_id: Optional[str] = None
+    processor_version: Optional[str] = None
+
+    openai_api_key: Optional[str] = None
+    openai_model: Optional[str] = None
+    openai_api_base: Optional[str] = None
+    # Smaller model scoring groundedness in RAG evaluations
+    judge_model: Optional[str] = None
+
+    # Embedding Configuration
+    embedding_model: Optional[str] = None
+
+    mongodb_uri: Optional[str] = None
+    mongodb_db: Optional[str] = None
+    mongodb_collection: Optional[str] = None
+    index_name: Optional[str] = None
+    vector_search_type: Optional[str] = None
+    index_fields: Optional[str] = None
+
+    # Session storage (in-memory when unset)
+    redis_url: Optional[str] = None
+
+    # Submit bulk RAG evaluations through the OpenAI Batch API (half price, completes within 24h)
+    use_batch_api: bool = False
+    # Return relevance only from /chat/evaluation and score groundedness later in a flushed batch
+    defer_groundedness: bool = False
+
+    @classmethod
+    def from_env(cls) -> "Config":
+        """Build the configuration from environment variables (and .env)"""
+        load_dotenv()
+        return cls(
+            google_application_credential=os.getenv("GOOGLE_APPLICATION_CREDENTIALS"),
+            project_id=os.getenv("PROJECT_ID"),
+            location=os.getenv("LOCATION"),
+            processor_id=os.getenv("PROCESSOR_ID"),
+            processor_version=os.getenv("PROCESSOR_VERSION"),
+
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            openai_model=os.getenv("OPENAI_MODEL"),
+            openai_api_base=os.getenv("OPENAI_API_BASE"),
+            judge_model=os.getenv("JUDGE_MODEL"),
+
+            embedding_model=os.getenv("EMBEDDING_MODEL"),
+
+            mongodb_uri=os.getenv("MONGODB_BASE_URL"),
+            mongodb_db=os.getenv("MONGODB_NAME"),
+            mongodb_collection=os.getenv("MONGODB_COLLECTION"),
+            index_name=os.getenv("INDEX_NAME"),
+            vector_search_type=os.getenv("VECTOR_SEARCH_TYPE"),
+            index_fields=os.getenv("INDEX_FIELDS"),
+
+            redis_url=os.getenv("REDIS_URL"),
+
+            use_batch_api=os.getenv("USE_BATCH_API", "").lower() in ("1", "true", "yes"),
+            defer_groundedness=os.getenv("DEFER_GROUNDEDNESS", "").lower() in ("1", "true", "yes"),
+        )
+
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    """Read the configuration once per process and share it with every component"""
+    return Config.from_env()
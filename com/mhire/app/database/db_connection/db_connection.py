@@ -1,20 +1,47 @@
 import logging
-from motor.motor_asyncio import AsyncIOMotorClient
-from com.mhire.app.config.config import Config
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from com.mhire.app.config.config import get_config
 
 logger = logging.getLogger(__name__)
 
-class DBConnection:
-    def __init__(self):
-        self.config = Config()
+# One client (and connection pool) per process, shared by every DBConnection
+_client: Optional[AsyncIOMotorClient] = None
+
+def get_client() -> AsyncIOMotorClient:
+    """Return the shared MongoDB client, creating it on first access."""
+    global _client
+    if _client is None:
         try:
-            self.client = AsyncIOMotorClient(self.config.mongodb_uri)
-            self.db = self.client[self.config.mongodb_db]
-            self.collection = self.db[self.config.mongodb_collection]
+            _client = AsyncIOMotorClient(
+                get_config().mongodb_uri,
+                maxPoolSize=100,
+                minPoolSize=10
+            )
             logger.info("MongoDB client initialized.")
         except Exception as e:
             logger.error(f"Failed to initialize MongoDB client: {e}")
             raise
+    return _client
+
+def get_db() -> AsyncIOMotorDatabase:
+    """Return the configured database on the shared client."""
+    return get_client()[get_config().mongodb_db]
+
+def close_client() -> None:
+    """Close the shared MongoDB client."""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+        logger.info("MongoDB client closed.")
+
+class DBConnection:
+    def __init__(self):
+        self.config = get_config()
+        self.client = get_client()
+        self.db = get_db()
+        self.collection = self.db[self.config.mongodb_collection]
 
     async def ping(self):
         """Check if MongoDB server is reachable."""
@@ -27,6 +54,4 @@ class DBConnection:
             return None
 
     def close(self):
-        if self.client:
-            self.client.close()
-            logger.info("MongoDB client closed.")
\ No newline at end of file
+        close_client()
@@ -2,157 +2,363 @@ import logging
 import time
 from typing import List, Optional
 from datetime import datetime
+import numpy as np
 from bson import ObjectId
-from pymongo.errors import DuplicateKeyError
+from bson.binary import Binary, BinaryVectorDtype
+from pymongo.operations import SearchIndexModel
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 
+from com.mhire.app.common.network_responses import elapsed_ms
 from com.mhire.app.database.db_connection.db_connection import DBConnection
-from com.mhire.app.utils.embedding_utility.embedding_create import EmbeddingCreator
-from com.mhire.app.utils.embedding_utility.embedding_retrieve import EmbeddingRetriever
+from com.mhire.app.utils.embedding_utility.embedding_create import get_embedding_creator
+from com.mhire.app.utils.embedding_utility.embedding_retrieve import EmbeddingRetriever, mark_documents_changed
 from com.mhire.app.database.embedding_manager.embedding_manager_schema import (
     EmbeddingRequest, 
     EmbeddingResponse, 
-    ChunkedEmbeddingResponse,
-    EmbeddingDocument
+    ChunkedEmbeddingResponse
 )
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of chunk documents sent in a single insert_many call
+INSERT_BATCH_SIZE = 1000
+
+# MongoDB error code returned when creating an index that already exists
+INDEX_ALREADY_EXISTS = 68
+
+# Set once the vector search index is known to exist with the current definition
+_index_ready = False
+
+def to_bson_vector(embedding: List[float]) -> Binary:
+    """Pack an embedding as a float32 BSON vector (binary subtype 9), half the size of a double array"""
+    return Binary.from_vector(np.asarray(embedding, dtype=np.float32), BinaryVectorDtype.FLOAT32)
+
+def vector_index_matches(existing: dict, wanted: dict) -> bool:
+    """
+    Whether an index definition reported by Atlas has every field of the wanted definition, with
+    the same settings; Atlas may add defaults of its own, which are ignored
+    """
+    existing_fields = {(field.get("type"), field.get("path")): field for field in existing.get("fields", [])}
+    
+    for field in wanted["fields"]:
+        current = existing_fields.get((field["type"], field["path"]))
+        if current is None or any(current.get(key) != value for key, value in field.items()):
+            return False
+    
+    return len(existing_fields) == len(wanted["fields"])
+
 class EmbeddingManager:
-    def __init__(self):
-        self.db_connection = DBConnection()
-        self.embedding_creator = EmbeddingCreator()
-        self.embedding_retriever = EmbeddingRetriever()
+    def __init__(self, db_connection: Optional[DBConnection] = None):
+        self.db_connection = db_connection or DBConnection()
+        self.embedding_creator = get_embedding_creator()
+        self.embedding_retriever = EmbeddingRetriever(self.db_connection)
         self.collection = self.db_connection.collection
         
     async def create_vector_index(self):
         """Create vector search index for embeddings"""
+        global _index_ready
+        
+        # Skip the round-trip once the index is known to exist in this process
+        if _index_ready:
+            return
+        
         try:
-            # Check if index already exists
-            indexes = await self.collection.list_indexes().to_list(length=None)
-            index_names = [index['name'] for index in indexes]
-            
-            if 'vector_index' not in index_names:
-                index_definition = {
-                    "fields": [
-                        {
-                            "type": "vector",
-                            "path": "embedding",
-                            "numDimensions": 1536,  # text-embedding-3-small dimensions
-                            "similarity": "cosine"
-                        },
-                        {
-                            "type": "filter",
-                            "path": "file_name"
-                        },
-                        {
-                            "type": "filter", 
-                            "path": "language_detected"
-                        },
-                        {
-                            "type": "filter",
-                            "path": "chunk_index"
-                        }
-                    ]
-                }
-                
-                await self.collection.create_search_index(
-                    "vector_index",
-                    "vectorSearch", 
-                    index_definition
+            index_definition = {
+                "fields": [
+                    {
+                        "type": "vector",
+                        "path": "embedding",
+                        "numDimensions": 1536,  # text-embedding-3-small dimensions
+                        "similarity": "cosine",
+                        # Atlas keeps int8 copies of the vectors in its HNSW graph (4x less memory)
+                        # and rescores the top candidates with the full-fidelity vectors
+                        "quantization": "scalar"
+                    },
+                    {
+                        "type": "filter",
+                        "path": "file_name"
+                    },
+                    {
+                        "type": "filter", 
+                        "path": "language_detected"
+                    },
+                    {
+                        "type": "filter",
+                        "path": "chunk_index"
+                    },
+                    {
+                        "type": "filter",
+                        "path": "created_at"
+                    }
+                ]
+            }
+            
+            # Create directly instead of listing search indexes first, an existing index is reported as code 68
+            await self.collection.create_search_index(
+                SearchIndexModel(
+                    definition=index_definition,
+                    name="vector_index",
+                    type="vectorSearch"
                 )
-                logger.info("Vector search index created successfully")
+            )
+            _index_ready = True
+            logger.info("Vector search index created successfully")
+            
+        except OperationFailure as e:
+            if e.code == INDEX_ALREADY_EXISTS:
+                _index_ready = await self.sync_vector_index(index_definition)
             else:
-                logger.info("Vector search index already exists")
-                
+                logger.error("Failed to create vector index: %s", e)
         except Exception as e:
-            logger.error(f"Failed to create vector index: {e}")
+            logger.error("Failed to create vector index: %s", e)
             # Don't raise exception as the service can work without index initially
 
+    async def sync_vector_index(self, index_definition: dict) -> bool:
+        """
+        Update the existing vector search index only when its definition differs from
+        index_definition (e.g. created before filter fields were added): every update makes
+        Atlas rebuild the index. Returns whether the index is known to be up to date
+        """
+        try:
+            indexes = await self.collection.list_search_indexes("vector_index").to_list(length=1)
+            existing = indexes[0].get("latestDefinition", {}) if indexes else {}
+            
+            if vector_index_matches(existing, index_definition):
+                logger.info("Vector search index already exists")
+                return True
+            
+            await self.collection.update_search_index("vector_index", index_definition)
+            logger.info("Vector search index definition updated")
+            return True
+            
+        except Exception as e:
+            logger.error("Failed to update vector index: %s", e)
+            return False
+
+    async def ensure_indexes(self):
+        """Create the vector search index and the file_name lookup index"""
+        await self.create_vector_index()
+        
+        try:
+            # Compound index also serves every {"file_name": ...} filter (prefix match)
+            await self.collection.create_index([("file_name", 1), ("chunk_index", 1)])
+            logger.info("file_name/chunk_index index ensured")
+        except Exception as e:
+            logger.error("Failed to create file_name index: %s", e)
+
+    def build_chunk_documents(
+        self,
+        file_name: str,
+        embeddings: List[List[float]],
+        chunks: List[str],
+        lengths: List[int],
+        language: str,
+        now: datetime
+    ) -> List[dict]:
+        """
+        Build the MongoDB documents for every chunk of a file, all stamped with the same time.
+        embeddings, chunks and lengths are parallel lists in chunk order.
+        """
+        total_chunks = len(embeddings)
+        
+        # Plain dicts rather than a validated model: the values come from our own
+        # pipeline, so skip model validation (an O(dim) pass over every embedding)
+        return [
+            {
+                "file_name": file_name,
+                "text": chunk_text,
+                "embedding": to_bson_vector(embedding),
+                "text_length": text_length,
+                "chunk_index": chunk_index,
+                "total_chunks": total_chunks,
+                "language_detected": language,
+                "created_at": now,
+                "updated_at": now
+            }
+            for chunk_index, (embedding, chunk_text, text_length) in enumerate(zip(embeddings, chunks, lengths))
+        ]
+
+    def build_chunked_response(
+        self, file_name: str, inserted_ids: List[Optional[str]], vector_dimensions: Optional[int], start_time: float
+    ) -> ChunkedEmbeddingResponse:
+        """Summarize the stored chunks of a file into a ChunkedEmbeddingResponse"""
+        total_chunks = len(inserted_ids)
+        embedding_ids = [inserted_id for inserted_id in inserted_ids if inserted_id is not None]
+        successful_chunks = len(embedding_ids)
+        failed_chunks = total_chunks - successful_chunks
+        
+        processing_time_ms = elapsed_ms(start_time)
+        
+        success = successful_chunks > 0
+        message = f"Processed {successful_chunks}/{total_chunks} chunks successfully"
+        
+        if failed_chunks > 0:
+            message += f" ({failed_chunks} failed)"
+        
+        logger.info("Chunked embedding processing completed for %s: %s", file_name, message)
+        
+        return ChunkedEmbeddingResponse(
+            success=success,
+            message=message,
+            file_name=file_name,
+            total_chunks=total_chunks,
+            successful_chunks=successful_chunks,
+            failed_chunks=failed_chunks,
+            embedding_ids=embedding_ids,
+            vector_dimensions=vector_dimensions,
+            processing_time_ms=processing_time_ms
+        )
+
+    def build_failed_response(self, file_name: str, error: Exception, start_time: float) -> ChunkedEmbeddingResponse:
+        """Build the ChunkedEmbeddingResponse for a file that could not be processed"""
+        processing_time_ms = elapsed_ms(start_time)
+        error_msg = f"Failed to process chunked embedding: {str(error)}"
+        logger.error(error_msg)
+        
+        return ChunkedEmbeddingResponse(
+            success=False,
+            message=error_msg,
+            file_name=file_name,
+            total_chunks=0,
+            successful_chunks=0,
+            failed_chunks=0,
+            processing_time_ms=processing_time_ms
+        )
+
     async def process_embedding_request(self, request: EmbeddingRequest) -> ChunkedEmbeddingResponse:
         """Process embedding request with chunking - stores ALL chunks of the document"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
-            logger.info(f"Processing chunked embedding for file: {request.file_name}")
+            logger.info("Processing chunked embedding for file: %s", request.file_name)
             
             # First, delete any existing chunks for this file
             await self.delete_all_chunks(request.file_name)
             
             # Create embeddings for all chunks
-            chunk_embeddings, language = await self.embedding_creator.create_embeddings_for_chunks(request.text)
-            
-            total_chunks = len(chunk_embeddings)
-            successful_chunks = 0
-            failed_chunks = 0
-            embedding_ids = []
-            
-            # Store each chunk as a separate document
-            for embedding, chunk_text, chunk_index in chunk_embeddings:
-                try:
-                    document = EmbeddingDocument(
-                        file_name=request.file_name,
-                        text=chunk_text,
-                        embedding=embedding,
-                        text_length=len(chunk_text),
-                        chunk_index=chunk_index,
-                        total_chunks=total_chunks,
-                        language_detected=language,
-                        created_at=datetime.utcnow(),
-                        updated_at=datetime.utcnow()
-                    )
-                    
-                    # Insert into database
-                    result = await self.collection.insert_one(document.dict())
-                    embedding_ids.append(str(result.inserted_id))
-                    successful_chunks += 1
-                    
-                except Exception as e:
-                    logger.error(f"Failed to store chunk {chunk_index}: {e}")
-                    failed_chunks += 1
-            
-            processing_time = round(time.time() - start_time, 2)
-            
-            success = successful_chunks > 0
-            message = f"Processed {successful_chunks}/{total_chunks} chunks successfully"
-            
-            if failed_chunks > 0:
-                message += f" ({failed_chunks} failed)"
-            
-            logger.info(f"Chunked embedding processing completed for {request.file_name}: {message}")
-            
-            return ChunkedEmbeddingResponse(
-                success=success,
-                message=message,
-                file_name=request.file_name,
-                total_chunks=total_chunks,
-                successful_chunks=successful_chunks,
-                failed_chunks=failed_chunks,
-                embedding_ids=embedding_ids,
-                vector_dimensions=len(chunk_embeddings[0][0]) if chunk_embeddings else None,
-                processing_time=processing_time
+            embeddings, chunks, lengths, language = await self.embedding_creator.create_embeddings_for_chunks(request.text)
+            dim = len(embeddings[0]) if embeddings else None
+            
+            # Build every chunk document first, then store them with bulk writes
+            documents = self.build_chunk_documents(request.file_name, embeddings, chunks, lengths, language, datetime.utcnow())
+            inserted_ids = await self.insert_documents(documents)
+            
+            return self.build_chunked_response(
+                request.file_name,
+                inserted_ids,
+                dim,
+                start_time
             )
             
         except Exception as e:
-            processing_time = round(time.time() - start_time, 2)
-            error_msg = f"Failed to process chunked embedding: {str(e)}"
-            logger.error(error_msg)
+            return self.build_failed_response(request.file_name, e, start_time)
+
+    async def process_batch_request(self, requests: List[EmbeddingRequest]) -> List[ChunkedEmbeddingResponse]:
+        """
+        Process several files in one pass: the chunks of every file are embedded
+        with a single embed_texts call and stored with a single insert_documents call.
+        Returns one ChunkedEmbeddingResponse per request, in request order.
+        """
+        start_time = time.perf_counter()
+        logger.info("Processing batch embedding for %s files", len(requests))
+        
+        results: List[Optional[ChunkedEmbeddingResponse]] = [None] * len(requests)
+        prepared = []  # (request position, chunks, chunk lengths, language)
+        
+        for position, request in enumerate(requests):
+            try:
+                chunks, lengths, language = self.embedding_creator.prepare_chunks(request.text)
+                prepared.append((position, chunks, lengths, language))
+            except Exception as e:
+                results[position] = self.build_failed_response(request.file_name, e, start_time)
+        
+        # Flatten the chunks of all files and embed them together
+        all_chunks = [chunk for _, chunks, _, _ in prepared for chunk in chunks]
+        
+        try:
+            embeddings = await self.embedding_creator.embed_texts(all_chunks)
+        except Exception as e:
+            for position, _, _, _ in prepared:
+                results[position] = self.build_failed_response(requests[position].file_name, e, start_time)
+            return results
+        
+        # Partition the vectors back by file boundaries
+        all_documents = []
+        file_spans = []  # (request position, first document index, document count, dimensions)
+        offset = 0
+        now = datetime.utcnow()
+        dim = len(embeddings[0]) if embeddings else None
+        
+        for position, chunks, lengths, language in prepared:
+            file_name = requests[position].file_name
+            file_embeddings = embeddings[offset:offset + len(chunks)]
+            offset += len(chunks)
             
-            return ChunkedEmbeddingResponse(
-                success=False,
-                message=error_msg,
-                file_name=request.file_name,
-                total_chunks=0,
-                successful_chunks=0,
-                failed_chunks=0,
-                processing_time=processing_time
+            # Replace any existing chunks for this file
+            await self.delete_all_chunks(file_name)
+            
+            documents = self.build_chunk_documents(file_name, file_embeddings, chunks, lengths, language, now)
+            
+            file_spans.append((
+                position,
+                len(all_documents),
+                len(documents),
+                dim if file_embeddings else None
+            ))
+            all_documents.extend(documents)
+        
+        # One bulk write across every file's chunks
+        inserted_ids = await self.insert_documents(all_documents)
+        
+        for position, first, count, vector_dimensions in file_spans:
+            results[position] = self.build_chunked_response(
+                requests[position].file_name,
+                inserted_ids[first:first + count],
+                vector_dimensions,
+                start_time
             )
+        
+        return results
+
+    async def insert_documents(self, documents: List[dict]) -> List[Optional[str]]:
+        """
+        Insert chunk documents with unordered insert_many calls of at most INSERT_BATCH_SIZE.
+        Returns the inserted id of every document, in order, with None for failed documents.
+        """
+        inserted_ids: List[Optional[str]] = []
+        
+        for i in range(0, len(documents), INSERT_BATCH_SIZE):
+            batch = documents[i:i + INSERT_BATCH_SIZE]
+            try:
+                result = await self.collection.insert_many(batch, ordered=False)
+                inserted_ids.extend(str(inserted_id) for inserted_id in result.inserted_ids)
+                
+            except BulkWriteError as e:
+                # Unordered writes keep going past failures, recover the per-document errors
+                write_errors = e.details.get("writeErrors", [])
+                failed_indexes = {error["index"] for error in write_errors}
+                for error in write_errors:
+                    logger.error("Failed to store chunk %s: %s", batch[error['index']].get('chunk_index'), error.get('errmsg'))
+                
+                # insert_many assigns _id to every document before sending the batch
+                inserted_ids.extend(
+                    None if j in failed_indexes else str(doc["_id"]) for j, doc in enumerate(batch)
+                )
+                
+            except Exception as e:
+                logger.error("Failed to store chunks %s-%s: %s", i, i + len(batch) - 1, e)
+                inserted_ids.extend([None] * len(batch))
+        
+        # Cached search results may miss the new chunks
+        await mark_documents_changed(self.collection)
+        return inserted_ids
 
     async def update_embedding(self, file_name: str, new_text: str) -> EmbeddingResponse:
         """Update existing embedding for a file"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
-            logger.info(f"Updating embedding for file: {file_name}")
+            logger.info("Updating embedding for file: %s", file_name)
             
             # Create new embedding
             embedding, language = await self.embedding_creator.create_embedding(new_text)
@@ -160,7 +366,7 @@ class EmbeddingManager:
             # Update document in database
             update_data = {
                 "text": new_text,
-                "embedding": embedding,
+                "embedding": to_bson_vector(embedding),
                 "text_length": len(new_text),
                 "language_detected": language,
                 "updated_at": datetime.utcnow()
@@ -171,27 +377,28 @@ class EmbeddingManager:
                 {"$set": update_data}
             )
             
-            processing_time = round(time.time() - start_time, 2)
+            processing_time_ms = elapsed_ms(start_time)
             
             if result.modified_count > 0:
-                logger.info(f"Successfully updated embedding for {file_name}")
+                await mark_documents_changed(self.collection)
+                logger.info("Successfully updated embedding for %s", file_name)
                 return EmbeddingResponse(
                     success=True,
                     message="Embedding updated successfully",
                     file_name=file_name,
                     vector_dimensions=len(embedding),
-                    processing_time=processing_time
+                    processing_time_ms=processing_time_ms
                 )
             else:
                 return EmbeddingResponse(
                     success=False,
                     message=f"No document found with file_name: {file_name}",
                     file_name=file_name,
-                    processing_time=processing_time
+                    processing_time_ms=processing_time_ms
                 )
                 
         except Exception as e:
-            processing_time = round(time.time() - start_time, 2)
+            processing_time_ms = elapsed_ms(start_time)
             error_msg = f"Failed to update embedding: {str(e)}"
             logger.error(error_msg)
             
@@ -199,13 +406,13 @@ class EmbeddingManager:
                 success=False,
                 message=error_msg,
                 file_name=file_name,
-                processing_time=processing_time
+                processing_time_ms=processing_time_ms
             )
 
     async def retrieve_embeddings(self, query_text: str) -> dict:
         """Retrieve embeddings using embedding utility for RAG testing"""
         try:
-            logger.info(f"Retrieving embeddings for query: {query_text[:100]}...")
+            logger.info("Retrieving embeddings for query: %.100s...", query_text)
             
             # Use embedding retriever utility
             result = await self.embedding_retriever.test_retrieval(query_text)
@@ -213,7 +420,7 @@ class EmbeddingManager:
             return result
             
         except Exception as e:
-            logger.error(f"Failed to retrieve embeddings: {e}")
+            logger.error("Failed to retrieve embeddings: %s", e)
             return {
                 "query": query_text,
                 "test_status": "failed",
@@ -228,12 +435,13 @@ class EmbeddingManager:
             deleted_count = result.deleted_count
             
             if deleted_count > 0:
-                logger.info(f"Deleted {deleted_count} existing chunks for {file_name}")
+                await mark_documents_changed(self.collection)
+                logger.info("Deleted %s existing chunks for %s", deleted_count, file_name)
             
             return deleted_count
                 
         except Exception as e:
-            logger.error(f"Failed to delete chunks for {file_name}: {e}")
+            logger.error("Failed to delete chunks for %s: %s", file_name, e)
             return 0
 
     async def delete_embedding(self, file_name: str) -> bool:
@@ -242,12 +450,13 @@ class EmbeddingManager:
             result = await self.collection.delete_many({"file_name": file_name})
             
             if result.deleted_count > 0:
-                logger.info(f"Successfully deleted {result.deleted_count} chunks for {file_name}")
+                await mark_documents_changed(self.collection)
+                logger.info("Successfully deleted %s chunks for %s", result.deleted_count, file_name)
                 return True
             else:
-                logger.warning(f"No embeddings found for {file_name}")
+                logger.warning("No embeddings found for %s", file_name)
                 return False
                 
         except Exception as e:
-            logger.error(f"Failed to delete embeddings: {e}")
+            logger.error("Failed to delete embeddings: %s", e)
             return False
\ No newline at end of file
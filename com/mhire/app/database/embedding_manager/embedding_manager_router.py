@@ -3,14 +3,24 @@ import time
 from typing import List, Optional
 from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
 
-from com.mhire.app.common.network_responses import NetworkResponse, HTTPCode
+from com.mhire.app.common.network_responses import NetworkResponse, HTTPCode, elapsed_ms
 from com.mhire.app.database.embedding_manager.embedding_manager import EmbeddingManager
 from com.mhire.app.database.embedding_manager.embedding_manager_schema import (
     EmbeddingRequest,
+    BatchEmbeddingRequest,
     EmbeddingResponse,
     ChunkedEmbeddingResponse,
-    EmbeddingSearchRequest
+    EmbeddingSearchRequest,
+    UpdateEmbeddingData,
+    RetrieveEmbeddingData,
+    DeleteEmbeddingData,
+    CreateEmbeddingResponseWrapper,
+    BatchEmbeddingResponseWrapper,
+    UpdateEmbeddingResponseWrapper,
+    RetrieveEmbeddingResponseWrapper,
+    DeleteEmbeddingResponseWrapper
 )
 
 logger = logging.getLogger(__name__)
@@ -25,18 +35,69 @@ router = APIRouter(
 # Initialize embedding manager
 embedding_manager = EmbeddingManager()
 
-@router.post("/create", response_model=dict)
+# Stateless response builder shared by every handler
+network_response = NetworkResponse()
+
+# Built once and reused to serialize the per-file results of multi-file requests
+_RESULTS_ADAPTER = TypeAdapter(List[ChunkedEmbeddingResponse])
+
+def validate_file_requests(requests: List[EmbeddingRequest]):
+    """Reject empty batches and files without a name or text"""
+    if not requests:
+        raise HTTPException(
+            status_code=HTTPCode.BAD_REQUEST,
+            detail="At least one file is required"
+        )
+    
+    for request in requests:
+        if not request.text.strip() or not request.file_name.strip():
+            raise HTTPException(
+                status_code=HTTPCode.BAD_REQUEST,
+                detail="File name and text content cannot be empty"
+            )
+
+def build_files_response(
+    results: List[ChunkedEmbeddingResponse],
+    resource: str,
+    start_time: float
+):
+    """Wrap the per-file results of a multi-file request in the standard envelope"""
+    successful_files = sum(1 for result in results if result.success)
+    
+    if successful_files > 0:
+        # Serialize the whole list in one call and render it as is: the results are
+        # already validated models, so they are not rebuilt into the response model
+        return network_response.success_response(
+            http_code=HTTPCode.CREATED,
+            message=f"Processed {successful_files}/{len(results)} files successfully",
+            data={"files": _RESULTS_ADAPTER.dump_python(results)},
+            resource=resource,
+            start_time=start_time
+        )
+    else:
+        return network_response.json_response(
+            http_code=HTTPCode.INTERNAL_SERVER_ERROR,
+            error_message="All files failed to process",
+            resource=resource,
+            start_time=start_time
+        )
+
+@router.post(
+    "/create",
+    response_model=None,
+    status_code=HTTPCode.CREATED,
+    responses={HTTPCode.CREATED: {"model": CreateEmbeddingResponseWrapper}}
+)
 async def create_embedding(request: EmbeddingRequest):
     """
     Create vector embeddings for ALL chunks of the provided text and store in database.
     This ensures no content is lost from large documents.
     Supports both Bengali and English text, including mixed content.
     """
-    start_time = time.time()
-    network_response = NetworkResponse()
+    start_time = time.perf_counter()
     
     try:
-        logger.info(f"Received embedding request for file: {request.file_name}")
+        logger.info("Received embedding request for file: %s", request.file_name)
         
         # Validate input
         if not request.text.strip():
@@ -55,18 +116,11 @@ async def create_embedding(request: EmbeddingRequest):
         result = await embedding_manager.process_embedding_request(request)
         
         if result.success:
+            # Dump the model in one pass and render it as is, without re-validating it
             return network_response.success_response(
                 http_code=HTTPCode.CREATED,
                 message=result.message,
-                data={
-                    "file_name": result.file_name,
-                    "total_chunks": result.total_chunks,
-                    "successful_chunks": result.successful_chunks,
-                    "failed_chunks": result.failed_chunks,
-                    "embedding_ids": result.embedding_ids,
-                    "vector_dimensions": result.vector_dimensions,
-                    "processing_time": f"{result.processing_time}s"
-                },
+                data=result.model_dump(exclude={"success", "message"}),
                 resource="/api/v1/create",
                 start_time=start_time
             )
@@ -81,7 +135,7 @@ async def create_embedding(request: EmbeddingRequest):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in create_embedding: {e}")
+        logger.error("Unexpected error in create_embedding: %s", e)
         return network_response.json_response(
             http_code=HTTPCode.INTERNAL_SERVER_ERROR,
             error_message=f"Internal server error: {str(e)}",
@@ -89,16 +143,50 @@ async def create_embedding(request: EmbeddingRequest):
             start_time=start_time
         )
 
-@router.put("/update/{file_name}", response_model=dict)
+@router.post(
+    "/create/batch",
+    response_model=None,
+    status_code=HTTPCode.CREATED,
+    responses={HTTPCode.CREATED: {"model": BatchEmbeddingResponseWrapper}}
+)
+async def create_embeddings_batch(request: BatchEmbeddingRequest):
+    """
+    Create embeddings for several files in a single request.
+    The chunks of all files are embedded together and stored with one bulk write,
+    avoiding a separate round-trip per file.
+    """
+    start_time = time.perf_counter()
+    
+    try:
+        logger.info("Received batch embedding request for %s files", len(request.requests))
+        
+        # Validate input
+        validate_file_requests(request.requests)
+        
+        results = await embedding_manager.process_batch_request(request.requests)
+        
+        return build_files_response(results, "/api/v1/create/batch", start_time)
+            
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Unexpected error in create_embeddings_batch: %s", e)
+        return network_response.json_response(
+            http_code=HTTPCode.INTERNAL_SERVER_ERROR,
+            error_message=f"Internal server error: {str(e)}",
+            resource="/api/v1/create/batch",
+            start_time=start_time
+        )
+
+@router.put("/update/{file_name}", response_model=UpdateEmbeddingResponseWrapper)
 async def update_embedding(file_name: str, request: dict):
     """
     Update existing embedding for a file with new text content.
     """
-    start_time = time.time()
-    network_response = NetworkResponse()
+    start_time = time.perf_counter()
     
     try:
-        logger.info(f"Received update request for file: {file_name}")
+        logger.info("Received update request for file: %s", file_name)
         
         # Validate input
         if "text" not in request or not request["text"].strip():
@@ -111,16 +199,15 @@ async def update_embedding(file_name: str, request: dict):
         result = await embedding_manager.update_embedding(file_name, request["text"])
         
         if result.success:
-            return network_response.success_response(
-                http_code=HTTPCode.SUCCESS,
+            return UpdateEmbeddingResponseWrapper(
                 message=result.message,
-                data={
-                    "file_name": result.file_name,
-                    "vector_dimensions": result.vector_dimensions,
-                    "processing_time": f"{result.processing_time}s"
-                },
+                data=UpdateEmbeddingData(
+                    file_name=result.file_name,
+                    vector_dimensions=result.vector_dimensions,
+                    processing_time_ms=result.processing_time_ms
+                ),
                 resource=f"/api/v1/update/{file_name}",
-                start_time=start_time
+                duration_ms=elapsed_ms(start_time)
             )
         else:
             status_code = HTTPCode.NOT_FOUND if "not found" in result.message.lower() else HTTPCode.INTERNAL_SERVER_ERROR
@@ -134,7 +221,7 @@ async def update_embedding(file_name: str, request: dict):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in update_embedding: {e}")
+        logger.error("Unexpected error in update_embedding: %s", e)
         return network_response.json_response(
             http_code=HTTPCode.INTERNAL_SERVER_ERROR,
             error_message=f"Internal server error: {str(e)}",
@@ -142,17 +229,16 @@ async def update_embedding(file_name: str, request: dict):
             start_time=start_time
         )
 
-@router.post("/retrieve", response_model=dict)
+@router.post("/retrieve", response_model=RetrieveEmbeddingResponseWrapper)
 async def retrieve_embeddings(request: EmbeddingSearchRequest):
     """
     Retrieve similar embeddings for RAG (Retrieval Augmented Generation).
     Supports both Bengali and English query text.
     """
-    start_time = time.time()
-    network_response = NetworkResponse()
+    start_time = time.perf_counter()
     
     try:
-        logger.info(f"Received retrieve request for query: {request.query_text[:50]}...")
+        logger.info("Received retrieve request for query: %.50s...", request.query_text)
         
         # Validate input
         if not request.query_text.strip():
@@ -164,23 +250,22 @@ async def retrieve_embeddings(request: EmbeddingSearchRequest):
         # Retrieve embeddings
         test_result = await embedding_manager.retrieve_embeddings(request.query_text)
         
-        return network_response.success_response(
-            http_code=HTTPCode.SUCCESS,
+        return RetrieveEmbeddingResponseWrapper(
             message=f"Retrieved {test_result.get('rag_context', {}).get('total_documents', 0)} relevant documents",
-            data={
-                "query": request.query_text,
-                "rag_context": test_result.get("rag_context", {}),
-                "raw_documents_count": test_result.get("raw_documents_count", 0),
-                "test_status": test_result.get("test_status", "unknown")
-            },
+            data=RetrieveEmbeddingData(
+                query=request.query_text,
+                rag_context=test_result.get("rag_context", {}),
+                raw_documents_count=test_result.get("raw_documents_count", 0),
+                test_status=test_result.get("test_status", "unknown")
+            ),
             resource="/api/v1/retrieve",
-            start_time=start_time
+            duration_ms=elapsed_ms(start_time)
         )
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in retrieve_embeddings: {e}")
+        logger.error("Unexpected error in retrieve_embeddings: %s", e)
         return network_response.json_response(
             http_code=HTTPCode.INTERNAL_SERVER_ERROR,
             error_message=f"Internal server error: {str(e)}",
@@ -188,26 +273,24 @@ async def retrieve_embeddings(request: EmbeddingSearchRequest):
             start_time=start_time
         )
 
-@router.delete("/delete/{file_name}", response_model=dict)
+@router.delete("/delete/{file_name}", response_model=DeleteEmbeddingResponseWrapper)
 async def delete_embedding(file_name: str):
     """
     Delete all embeddings/chunks by file name.
     """
-    start_time = time.time()
-    network_response = NetworkResponse()
+    start_time = time.perf_counter()
     
     try:
-        logger.info(f"Deleting embedding for file: {file_name}")
+        logger.info("Deleting embedding for file: %s", file_name)
         
         deleted = await embedding_manager.delete_embedding(file_name)
         
         if deleted:
-            return network_response.success_response(
-                http_code=HTTPCode.SUCCESS,
+            return DeleteEmbeddingResponseWrapper(
                 message=f"All chunks for {file_name} deleted successfully",
-                data={"file_name": file_name, "deleted": True},
+                data=DeleteEmbeddingData(file_name=file_name, deleted=True),
                 resource=f"/api/v1/delete/{file_name}",
-                start_time=start_time
+                duration_ms=elapsed_ms(start_time)
             )
         else:
             return network_response.json_response(
@@ -218,7 +301,7 @@ async def delete_embedding(file_name: str):
             )
             
     except Exception as e:
-        logger.error(f"Unexpected error in delete_embedding: {e}")
+        logger.error("Unexpected error in delete_embedding: %s", e)
         return network_response.json_response(
             http_code=HTTPCode.INTERNAL_SERVER_ERROR,
             error_message=f"Internal server error: {str(e)}",
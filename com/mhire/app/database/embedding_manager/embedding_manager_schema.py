@@ -1,18 +1,21 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, Generic, List, Optional, TypeVar
 from datetime import datetime
 
 class EmbeddingRequest(BaseModel):
     file_name: str = Field(..., description="Name of the file being processed")
     text: str = Field(..., description="Text content to create embeddings for")
 
+class BatchEmbeddingRequest(BaseModel):
+    requests: List[EmbeddingRequest] = Field(..., description="Files to create embeddings for in a single batch")
+
 class EmbeddingResponse(BaseModel):
     success: bool
     message: str
     file_name: str
     embedding_id: Optional[str] = None
     vector_dimensions: Optional[int] = None
-    processing_time: Optional[float] = None
+    processing_time_ms: Optional[int] = None
 
 class ChunkedEmbeddingResponse(BaseModel):
     success: bool
@@ -23,18 +26,7 @@ class ChunkedEmbeddingResponse(BaseModel):
     failed_chunks: int
     embedding_ids: List[str] = Field(default_factory=list)
     vector_dimensions: Optional[int] = None
-    processing_time: Optional[float] = None
-
-class EmbeddingDocument(BaseModel):
-    file_name: str
-    text: str
-    embedding: List[float]
-    text_length: int
-    chunk_index: int = Field(default=0, description="Index of the chunk within the document")
-    total_chunks: int = Field(default=1, description="Total number of chunks for this document")
-    language_detected: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    processing_time_ms: Optional[int] = None
 
 class EmbeddingSearchRequest(BaseModel):
     query_text: str = Field(..., description="Text to search for similar embeddings")
@@ -45,4 +37,67 @@ class EmbeddingSearchResult(BaseModel):
     file_name: str
     text: str
     similarity_score: float
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+# Response envelopes returned directly by the embedding routes, same shape as NetworkResponse.success_response
+DataT = TypeVar("DataT")
+
+class ResponseWrapper(BaseModel, Generic[DataT]):
+    success: bool = True
+    message: str
+    data: DataT
+    resource: str
+    duration_ms: int
+
+class CreateEmbeddingData(BaseModel):
+    file_name: str
+    total_chunks: int
+    successful_chunks: int
+    failed_chunks: int
+    embedding_ids: List[str] = Field(default_factory=list)
+    vector_dimensions: Optional[int] = None
+    processing_time_ms: int
+
+class FileEmbeddingData(BaseModel):
+    success: bool
+    message: str
+    file_name: str
+    total_chunks: int
+    successful_chunks: int
+    failed_chunks: int
+    embedding_ids: List[str] = Field(default_factory=list)
+    vector_dimensions: Optional[int] = None
+    processing_time_ms: int
+
+class BatchEmbeddingData(BaseModel):
+    files: List[FileEmbeddingData]
+
+class UpdateEmbeddingData(BaseModel):
+    file_name: str
+    vector_dimensions: Optional[int] = None
+    processing_time_ms: int
+
+class RetrieveEmbeddingData(BaseModel):
+    query: str
+    rag_context: Dict[str, Any]
+    raw_documents_count: int
+    test_status: str
+
+class DeleteEmbeddingData(BaseModel):
+    file_name: str
+    deleted: bool
+
+class CreateEmbeddingResponseWrapper(ResponseWrapper[CreateEmbeddingData]):
+    pass
+
+class BatchEmbeddingResponseWrapper(ResponseWrapper[BatchEmbeddingData]):
+    pass
+
+class UpdateEmbeddingResponseWrapper(ResponseWrapper[UpdateEmbeddingData]):
+    pass
+
+class RetrieveEmbeddingResponseWrapper(ResponseWrapper[RetrieveEmbeddingData]):
+    pass
+
+class DeleteEmbeddingResponseWrapper(ResponseWrapper[DeleteEmbeddingData]):
+    pass
@@ -3,16 +3,25 @@ import time
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from com.mhire.app.common.network_responses import NetworkResponse, HTTPCode
+from com.mhire.app.common.network_responses import NetworkResponse, HTTPCode, ORJSONResponse
+from com.mhire.app.database.db_connection.db_connection import get_client, close_client
+from com.mhire.app.utils.embedding_utility.embedding_create import close_embedding_creator
 from com.mhire.app.services.document_processing.document_extract_router import router as extract_router
-from com.mhire.app.database.embedding_manager.embedding_manager_router import router as embedding_router
-from com.mhire.app.services.ai_chatbot.ai_chatbot_router import router as chatbot_router
+from com.mhire.app.database.embedding_manager.embedding_manager_router import router as embedding_router, embedding_manager
+from com.mhire.app.services.ai_chatbot.ai_chatbot_router import router as chatbot_router, ai_chatbot
+from com.mhire.app.utils.rag_evaluation.rag_evaluation import warm_up
 logging.basicConfig(level=logging.INFO)
 
+# At import, so with gunicorn's preload_app the warmed-up pages are shared by every forked worker
+warm_up()
+
+network_response = NetworkResponse()
+
 app = FastAPI(
     title="AI-Extractor",
     description="AI-powered document extraction and description generation service",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -29,12 +38,27 @@ app.include_router(extract_router)
 app.include_router(embedding_router)
 app.include_router(chatbot_router)
 
+# Lifecycle events
+@app.on_event("startup")
+async def startup_event():
+    """Create the shared MongoDB client and the collection indexes before serving requests"""
+    get_client()
+    await embedding_manager.ensure_indexes()
+    if ai_chatbot.config.defer_groundedness:
+        await ai_chatbot.rag_evaluator.ensure_indexes()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release the shared MongoDB connection pool, the OpenAI HTTP clients and the session connections"""
+    close_client()
+    await ai_chatbot.close()
+    await close_embedding_creator()
+
 # Exception handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(http_request: Request, exc: HTTPException):
     """Handle HTTP exceptions and return network response format"""
-    start_time = time.time()
-    network_response = NetworkResponse()
+    start_time = time.perf_counter()
     return network_response.json_response(
         http_code=exc.status_code,
         error_message=str(exc.detail),
@@ -45,8 +69,7 @@ async def http_exception_handler(http_request: Request, exc: HTTPException):
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handle validation errors and return network response format"""
-    start_time = time.time()
-    network_response = NetworkResponse()
+    start_time = time.perf_counter()
     return network_response.json_response(
         http_code=HTTPCode.BAD_REQUEST,
         error_message=f"Validation error: {str(exc)}",
@@ -56,8 +79,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
 @app.get("/")
 async def root():
-    start_time = time.time()
-    network_response = NetworkResponse()
+    start_time = time.perf_counter()
     return network_response.success_response(
         http_code=HTTPCode.SUCCESS,
         message="API is running",
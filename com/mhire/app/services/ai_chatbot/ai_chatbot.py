@@ -1,20 +1,21 @@
+import asyncio
 import logging
 import time
-import re
-from typing import Dict, List, Optional, Any
-from datetime import datetime
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
+import httpx
 import openai
-from langchain.memory import ConversationBufferMemory
-from langchain.schema import BaseMessage, HumanMessage, AIMessage
 
-from com.mhire.app.config.config import Config
-from com.mhire.app.utils.embedding_utility.embedding_retrieve import EmbeddingRetriever
-from com.mhire.app.utils.embedding_utility.embedding_create import EmbeddingCreator
+from com.mhire.app.config.config import get_config
+from com.mhire.app.common.network_responses import elapsed_ms
+from com.mhire.app.utils.embedding_utility.embedding_retrieve import EmbeddingRetriever, on_documents_changed
+from com.mhire.app.utils.embedding_utility.embedding_create import get_embedding_creator
 from com.mhire.app.utils.rag_evaluation.rag_evaluation import RAGEvaluator
+from com.mhire.app.services.ai_chatbot.ai_chatbot_session_store import create_session_store
+from com.mhire.app.services.ai_chatbot.ai_chatbot_semantic_cache import SemanticCache, context_digest
 from com.mhire.app.services.ai_chatbot.ai_chatbot_schema import (
     ChatRequest, 
     ChatResponse, 
-    ChatMessage, 
     SessionHistory,
     RAGContext,
     ChatEvaluationRequest,
@@ -25,56 +26,8 @@ from com.mhire.app.services.ai_chatbot.ai_chatbot_schema import (
 
 logger = logging.getLogger(__name__)
 
-class AIChatbot:
-    def __init__(self):
-        self.config = Config()
-        self.openai_client = openai.AsyncOpenAI(
-            api_key=self.config.openai_api_key
-        )
-        self.embedding_retriever = EmbeddingRetriever()
-        self.embedding_creator = EmbeddingCreator()
-        self.rag_evaluator = RAGEvaluator()
-        
-        # In-memory session storage (in production, consider using Redis or database)
-        self.session_memories: Dict[str, ConversationBufferMemory] = {}
-        self.session_histories: Dict[str, SessionHistory] = {}
-        
-        # Model configuration
-        self.chat_model = self.config.openai_model or "gpt-3.5-turbo"
-        
-    def detect_language(self, text: str) -> str:
-        """Detect the language of user input"""
-        return self.embedding_creator.detect_language(text)
-    
-    def get_or_create_session_memory(self, session_id: str) -> ConversationBufferMemory:
-        """Get or create conversation memory for a session"""
-        if session_id not in self.session_memories:
-            self.session_memories[session_id] = ConversationBufferMemory(
-                return_messages=True,
-                memory_key="chat_history"
-            )
-            self.session_histories[session_id] = SessionHistory(session_id=session_id)
-        
-        return self.session_memories[session_id]
-    
-    def add_message_to_history(self, session_id: str, role: str, content: str, language: str = None):
-        """Add message to session history"""
-        if session_id not in self.session_histories:
-            self.session_histories[session_id] = SessionHistory(session_id=session_id)
-        
-        message = ChatMessage(role=role, content=content)
-        self.session_histories[session_id].messages.append(message)
-        self.session_histories[session_id].last_updated = datetime.utcnow()
-        
-        if language and not self.session_histories[session_id].language_preference:
-            self.session_histories[session_id].language_preference = language
-    
-    def build_conversation_prompt(self, user_message: str, context: str, language: str, chat_history: List[BaseMessage]) -> List[Dict[str, str]]:
-        """Build conversation prompt with history and RAG context - IMPROVED VERSION"""
-        
-        # System message based on language with stronger emphasis on using context
-        if language == "bengali":
-            system_message = f"""আপনি একটি বিশেষজ্ঞ AI সহায়ক যিনি শুধুমাত্র প্রদত্ত প্রসঙ্গ থেকে উত্তর দেন।
+# System prompts per detected language, each with a single {context} placeholder
+SYSTEM_TEMPLATE_BENGALI = """আপনি একটি বিশেষজ্ঞ AI সহায়ক যিনি শুধুমাত্র প্রদত্ত প্রসঙ্গ থেকে উত্তর দেন।
 
 প্রসঙ্গ:
 {context}
@@ -87,8 +40,7 @@ class AIChatbot:
 - বাংলায় উত্তর দিন
 - অপ্রয়োজনীয় ব্যাখ্যা এড়িয়ে চলুন"""
 
-        elif language == "mixed":
-            system_message = f"""Apni ekti expert AI assistant jo ONLY provided context theke answer den.
+SYSTEM_TEMPLATE_MIXED = """Apni ekti expert AI assistant jo ONLY provided context theke answer den.
 
 Context:
 {context}
@@ -101,8 +53,7 @@ Important Instructions:
 - Respond in mixed Bengali-English as appropriate
 - Avoid unnecessary explanations"""
 
-        else:  # English or unknown
-            system_message = f"""You are an expert AI assistant who answers ONLY from the provided context.
+SYSTEM_TEMPLATE_ENGLISH = """You are an expert AI assistant who answers ONLY from the provided context.
 
 Context:
 {context}
@@ -115,33 +66,104 @@ Critical Instructions:
 - Be precise and avoid unnecessary explanations
 - Respond in English"""
 
+# Maximum number of chat completions in flight per process
+MAX_CONCURRENT_COMPLETIONS = 50
+
+# Answers returned when the LLM call fails; these are never cached
+FALLBACK_RESPONSE_DEFAULT = "I'm sorry, I'm unable to answer your question right now. Please try again later."
+FALLBACK_RESPONSES = {
+    "bengali": "দুঃখিত, আমি এই মুহূর্তে আপনার প্রশ্নের উত্তর দিতে পারছি না। অনুগ্রহ করে পরে আবার চেষ্টা করুন।"
+}
+
+class AIChatbot:
+    def __init__(self, session_store=None):
+        self.config = get_config()
+        
+        # One pooled HTTP/2 client reused by every OpenAI call (keep-alive instead of new TLS handshakes)
+        self._http = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            timeout=httpx.Timeout(30.0)
+        )
+        self.openai_client = openai.AsyncOpenAI(
+            api_key=self.config.openai_api_key,
+            http_client=self._http
+        )
+        
+        # Bound concurrent completions to smooth bursts against the OpenAI rate limit
+        self._llm_sem = asyncio.Semaphore(MAX_CONCURRENT_COMPLETIONS)
+        
+        self.embedding_retriever = EmbeddingRetriever()
+        self.embedding_creator = get_embedding_creator()
+        self.rag_evaluator = RAGEvaluator()
+        
+        # Session storage: Redis when REDIS_URL is configured, in-process otherwise
+        self.session_store = session_store or create_session_store(self.config)
+        
+        # Answers to near-identical queries over the same retrieved sources are reused instead
+        # of calling the LLM again; dropped whenever the stored documents change
+        self.semantic_cache = SemanticCache()
+        on_documents_changed(self.semantic_cache.clear)
+        
+        # System prompt templates keyed by language
+        self._sys_templates = {
+            "bengali": SYSTEM_TEMPLATE_BENGALI,
+            "mixed": SYSTEM_TEMPLATE_MIXED,
+            "english": SYSTEM_TEMPLATE_ENGLISH
+        }
+        
+        # Model configuration
+        self.chat_model = self.config.openai_model or "gpt-3.5-turbo"
+        
+    def detect_language(self, text: str) -> str:
+        """Detect the language of user input"""
+        return self.embedding_creator.detect_language(text)
+    
+    def build_conversation_prompt(self, user_message: str, context: str, language: str, chat_history: List[Tuple[str, str]]) -> List[Dict[str, str]]:
+        """Build conversation prompt with history and RAG context - IMPROVED VERSION"""
+        
+        # System message based on language with stronger emphasis on using context
+        template = self._sys_templates.get(language, SYSTEM_TEMPLATE_ENGLISH)  # English or unknown
+        system_message = template.format(context=context)
+
         # Build messages array
         messages = [{"role": "system", "content": system_message}]
         
-        # Add conversation history (last 5 messages to avoid token limit and focus on context)
-        recent_history = chat_history[-5:] if len(chat_history) > 5 else chat_history
-        for msg in recent_history:
-            if isinstance(msg, HumanMessage):
-                messages.append({"role": "user", "content": msg.content})
-            elif isinstance(msg, AIMessage):
-                messages.append({"role": "assistant", "content": msg.content})
+        # Add conversation history (the session store already returns only the last 5 (role, content) messages)
+        messages.extend({"role": role, "content": content} for role, content in chat_history)
         
         # Add current user message
         messages.append({"role": "user", "content": user_message})
         
         return messages
     
-    async def generate_response(self, user_message: str, context: str, language: str, chat_history: List[BaseMessage]) -> str:
-        """Generate AI response using OpenAI"""
-        try:
-            messages = self.build_conversation_prompt(user_message, context, language, chat_history)
-            
-            response = await self.openai_client.chat.completions.create(
+    @staticmethod
+    def _answer_cache_key(rag_context: Dict[str, Any], chat_history: List[Tuple[str, str]]) -> Optional[str]:
+        """
+        Semantic cache key of a turn: the digest of its retrieved context, or None when the answer
+        must not be cached, i.e. a follow-up in a conversation (it depends on the earlier turns)
+        or a question without any retrieved source
+        """
+        if chat_history or not rag_context["sources"]:
+            return None
+        return context_digest(rag_context["context"])
+    
+    async def _create_completion(self, messages: List[Dict[str, str]]):
+        """Single chat completion call, bounded by the completion semaphore"""
+        async with self._llm_sem:
+            return await self.openai_client.chat.completions.create(
                 model=self.chat_model,
                 messages=messages,
                 max_tokens=1000,  # Increased to handle longer context
                 temperature=0.1  # Lower temperature for more focused answers
             )
+    
+    async def generate_response(self, user_message: str, context: str, language: str, chat_history: List[Tuple[str, str]]) -> str:
+        """Generate AI response using OpenAI"""
+        try:
+            messages = self.build_conversation_prompt(user_message, context, language, chat_history)
+            
+            response = await self._create_completion(messages)
             
             return response.choices[0].message.content.strip()
             
@@ -149,14 +171,107 @@ Critical Instructions:
             logger.error(f"Failed to generate AI response: {e}")
             
             # Fallback responses based on language
-            if language == "bengali":
-                return "দুঃখিত, আমি এই মুহূর্তে আপনার প্রশ্নের উত্তর দিতে পারছি না। অনুগ্রহ করে পরে আবার চেষ্টা করুন।"
+            return FALLBACK_RESPONSES.get(language, FALLBACK_RESPONSE_DEFAULT)
+    
+    async def stream_response(self, user_message: str, context: str, language: str, chat_history: List[Tuple[str, str]]) -> AsyncIterator[str]:
+        """
+        Stream the AI response from OpenAI token by token. A failure before the first token yields
+        the fallback answer; a failure after it is re-raised, the answer sent so far is incomplete
+        """
+        messages = self.build_conversation_prompt(user_message, context, language, chat_history)
+        streamed = False
+        
+        try:
+            async with self._llm_sem:
+                stream = await self.openai_client.chat.completions.create(
+                    model=self.chat_model,
+                    messages=messages,
+                    max_tokens=1000,
+                    temperature=0.1,
+                    stream=True
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        streamed = True
+                        yield chunk.choices[0].delta.content
+                        
+        except Exception as e:
+            logger.error(f"Failed to stream AI response: {e}")
+            
+            if streamed:
+                raise
+            
+            # Fallback response only if nothing was sent yet
+            yield FALLBACK_RESPONSES.get(language, FALLBACK_RESPONSE_DEFAULT)
+    
+    async def stream_chat_request(self, request: ChatRequest) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process chat request like process_chat_request but stream the answer.
+        Yields events: "metadata" (language and sources), one "token" per text delta,
+        then "done" once the turn is stored, or "error" if processing failed.
+        """
+        start_time = time.perf_counter()
+        
+        try:
+            logger.info(f"Processing streaming chat request for session: {request.session_id}")
+            
+            language = self.detect_language(request.message)
+            logger.info(f"Detected language: {language}")
+            
+            query_embedding, chat_history = await asyncio.gather(
+                self.embedding_creator.create_query_embedding(request.message),
+                self.session_store.get_chat_history(request.session_id)
+            )
+            
+            rag_context = await self.embedding_retriever.retrieve_context_for_rag(
+                query_text=request.message,
+                max_context_length=15000,
+                query_embedding=query_embedding
+            )
+            
+            yield {
+                "event": "metadata",
+                "data": {"session_id": request.session_id, "language_detected": language, "sources_used": rag_context["sources"]}
+            }
+            
+            cache_key = self._answer_cache_key(rag_context, chat_history)
+            cached = self.semantic_cache.lookup(language, cache_key, query_embedding) if cache_key else None
+            if cached:
+                yield {"event": "token", "data": cached}
+                await self.session_store.add_turn(request.session_id, request.message, cached, language)
             else:
-                return "I'm sorry, I'm unable to answer your question right now. Please try again later."
+                # Forward tokens as they arrive and keep them to store the full answer
+                tokens = []
+                completed = True
+                try:
+                    async for token in self.stream_response(
+                        user_message=request.message,
+                        context=rag_context["context"],
+                        language=language,
+                        chat_history=chat_history
+                    ):
+                        tokens.append(token)
+                        yield {"event": "token", "data": token}
+                except Exception:
+                    # Cut off mid-answer (already logged): keep what was sent in the session, never cache it
+                    completed = False
+                
+                ai_response = "".join(tokens).strip()
+                await self.session_store.add_turn(request.session_id, request.message, ai_response, language)
+                
+                if completed and cache_key and ai_response != FALLBACK_RESPONSES.get(language, FALLBACK_RESPONSE_DEFAULT):
+                    self.semantic_cache.add(language, cache_key, query_embedding, ai_response)
+            
+            yield {"event": "done", "data": {"duration_ms": elapsed_ms(start_time)}}
+            
+        except Exception as e:
+            error_msg = f"Failed to process chat request: {str(e)}"
+            logger.error(error_msg)
+            yield {"event": "error", "data": {"message": error_msg}}
     
     async def process_chat_request(self, request: ChatRequest) -> ChatResponse:
         """Process chat request with RAG and conversation memory - IMPROVED"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
             logger.info(f"Processing chat request for session: {request.session_id}")
@@ -165,13 +280,18 @@ Critical Instructions:
             language = self.detect_language(request.message)
             logger.info(f"Detected language: {language}")
             
-            # Get or create session memory
-            memory = self.get_or_create_session_memory(request.session_id)
+            # Embed the query (used for retrieval and for the semantic cache) and load
+            # the session history concurrently, they don't depend on each other
+            query_embedding, chat_history = await asyncio.gather(
+                self.embedding_creator.create_query_embedding(request.message),
+                self.session_store.get_chat_history(request.session_id)
+            )
             
             # Retrieve relevant context using RAG
             rag_context = await self.embedding_retriever.retrieve_context_for_rag(
                 query_text=request.message,
-                max_context_length=15000  # Increased to accommodate full documents without truncation
+                max_context_length=15000,  # Increased to accommodate full documents without truncation
+                query_embedding=query_embedding
             )
             
             # Debug logging for RAG context
@@ -182,28 +302,28 @@ Critical Instructions:
             else:
                 logger.warning("No context retrieved for RAG!")
             
-            # Get chat history
-            chat_history = memory.chat_memory.messages
-            
-            # Generate AI response
-            ai_response = await self.generate_response(
-                user_message=request.message,
-                context=rag_context["context"],
-                language=language,
-                chat_history=chat_history
-            )
+            cache_key = self._answer_cache_key(rag_context, chat_history)
+            ai_response = self.semantic_cache.lookup(language, cache_key, query_embedding) if cache_key else None
             
-            # Update conversation memory
-            memory.chat_memory.add_user_message(request.message)
-            memory.chat_memory.add_ai_message(ai_response)
+            if ai_response is None:
+                # Generate AI response
+                ai_response = await self.generate_response(
+                    user_message=request.message,
+                    context=rag_context["context"],
+                    language=language,
+                    chat_history=chat_history
+                )
+                
+                # Only cache grounded answers, never the failure fallback
+                if cache_key and ai_response != FALLBACK_RESPONSES.get(language, FALLBACK_RESPONSE_DEFAULT):
+                    self.semantic_cache.add(language, cache_key, query_embedding, ai_response)
             
-            # Add to session history
-            self.add_message_to_history(request.session_id, "user", request.message, language)
-            self.add_message_to_history(request.session_id, "assistant", ai_response)
+            # Update conversation memory and session history
+            await self.session_store.add_turn(request.session_id, request.message, ai_response, language)
             
-            processing_time = round(time.time() - start_time, 2)
+            processing_time = time.perf_counter() - start_time
             
-            return ChatResponse(
+            return ChatResponse.model_construct(
                 success=True,
                 message="Response generated successfully",
                 response=ai_response,
@@ -214,7 +334,7 @@ Critical Instructions:
             )
             
         except Exception as e:
-            processing_time = round(time.time() - start_time, 2)
+            processing_time = time.perf_counter() - start_time
             error_msg = f"Failed to process chat request: {str(e)}"
             logger.error(error_msg)
             
@@ -227,7 +347,7 @@ Critical Instructions:
     
     async def process_chat_evaluation(self, request: ChatEvaluationRequest) -> ChatEvaluationResponse:
         """Process chat request with comprehensive RAG evaluation - Groundedness and Relevance only"""
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
             logger.info(f"Processing chat evaluation for session: {request.session_id}")
@@ -236,25 +356,21 @@ Critical Instructions:
             language = self.detect_language(request.message)
             logger.info(f"Detected language: {language}")
             
-            # Get or create session memory
-            memory = self.get_or_create_session_memory(request.session_id)
-            
-            # Retrieve relevant context using RAG
-            rag_context = await self.embedding_retriever.retrieve_context_for_rag(
-                query_text=request.message,
-                max_context_length=15000
+            # Embed the query and load the session history concurrently
+            query_embedding, chat_history = await asyncio.gather(
+                self.embedding_creator.create_query_embedding(request.message),
+                self.session_store.get_chat_history(request.session_id)
             )
             
-            # Get raw documents for evaluation
-            raw_documents = await self.embedding_retriever.retrieve_similar_documents(
+            # One vector search yields both the RAG context and the raw documents for evaluation
+            rag_context, raw_documents = await self.embedding_retriever.retrieve_context_and_docs(
                 query_text=request.message,
+                max_context_length=15000,
                 limit=5,
-                similarity_threshold=0.4
+                similarity_threshold=0.4,
+                query_embedding=query_embedding
             )
             
-            # Get chat history
-            chat_history = memory.chat_memory.messages
-            
             # Generate AI response
             ai_response = await self.generate_response(
                 user_message=request.message,
@@ -263,40 +379,49 @@ Critical Instructions:
                 chat_history=chat_history
             )
             
-            # Perform comprehensive RAG evaluation (groundedness and relevance only)
-            evaluation_result = await self.rag_evaluator.comprehensive_evaluation(
-                query=request.message,
-                actual_answer=ai_response,
-                expected_answer=request.expected_answer,
-                context=rag_context["context"],
-                retrieved_documents=raw_documents
-            )
-            
-            # Update conversation memory
-            memory.chat_memory.add_user_message(request.message)
-            memory.chat_memory.add_ai_message(ai_response)
+            evaluation_id = None
+            if self.config.defer_groundedness:
+                # Relevance only online; the groundedness judgment is queued for the next flush
+                evaluation_id = uuid.uuid4().hex
+                evaluation_result, _ = await asyncio.gather(
+                    self.rag_evaluator.comprehensive_evaluation_fast(
+                        query=request.message,
+                        retrieved_documents=raw_documents
+                    ),
+                    self.rag_evaluator.enqueue_for_groundedness(evaluation_id, ai_response, rag_context["context"])
+                )
+            else:
+                # Perform comprehensive RAG evaluation (groundedness and relevance only)
+                evaluation_result = await self.rag_evaluator.comprehensive_evaluation(
+                    query=request.message,
+                    actual_answer=ai_response,
+                    expected_answer=request.expected_answer,
+                    context=rag_context["context"],
+                    retrieved_documents=raw_documents
+                )
             
-            # Add to session history
-            self.add_message_to_history(request.session_id, "user", request.message, language)
-            self.add_message_to_history(request.session_id, "assistant", ai_response)
+            # Update conversation memory and session history
+            await self.session_store.add_turn(request.session_id, request.message, ai_response, language)
             
-            processing_time = round(time.time() - start_time, 2)
+            processing_time = time.perf_counter() - start_time
             
-            # Build response with evaluation metrics (groundedness and relevance only)
-            return ChatEvaluationResponse(
+            # Build response with evaluation metrics (groundedness and relevance only);
+            # the evaluator's output is trusted, so skip re-validating it
+            return ChatEvaluationResponse.model_construct(
                 success=True,
                 message="Chat evaluation completed successfully",
                 actual_answer=ai_response,
                 session_id=request.session_id,
                 overall_score=evaluation_result.get("overall_score"),
                 quality=evaluation_result.get("quality"),
-                groundedness=GroundednessEvaluation(**evaluation_result.get("groundedness", {})) if evaluation_result.get("groundedness") else None,
-                relevance=RelevanceEvaluation(**evaluation_result.get("relevance", {})) if evaluation_result.get("relevance") else None,
+                groundedness=GroundednessEvaluation.model_construct(**evaluation_result["groundedness"]) if evaluation_result.get("groundedness") else None,
+                relevance=RelevanceEvaluation.model_construct(**evaluation_result["relevance"]) if evaluation_result.get("relevance") else None,
+                evaluation_id=evaluation_id,
                 processing_time=processing_time
             )
             
         except Exception as e:
-            processing_time = round(time.time() - start_time, 2)
+            processing_time = time.perf_counter() - start_time
             error_msg = f"Failed to process chat evaluation: {str(e)}"
             logger.error(error_msg)
             
@@ -307,22 +432,32 @@ Critical Instructions:
                 processing_time=processing_time
             )
     
-    def get_session_history(self, session_id: str) -> Optional[SessionHistory]:
+    async def flush_deferred_groundedness(self) -> Dict[str, int]:
+        """Score (or submit to a batch) the queued groundedness judgments of deferred evaluations"""
+        return await self.rag_evaluator.flush_groundedness_queue()
+    
+    async def get_deferred_groundedness(self, evaluation_id: str) -> Optional[Dict[str, Any]]:
+        """Status and groundedness result of a deferred evaluation"""
+        return await self.rag_evaluator.get_deferred_groundedness(evaluation_id)
+    
+    async def get_session_history(self, session_id: str) -> Optional[SessionHistory]:
         """Get session history"""
-        return self.session_histories.get(session_id)
+        return await self.session_store.get_history(session_id)
     
-    def clear_session(self, session_id: str) -> bool:
+    async def clear_session(self, session_id: str) -> bool:
         """Clear session memory and history"""
         try:
-            if session_id in self.session_memories:
-                del self.session_memories[session_id]
-            if session_id in self.session_histories:
-                del self.session_histories[session_id]
-            return True
+            return await self.session_store.clear(session_id)
         except Exception as e:
             logger.error(f"Failed to clear session {session_id}: {e}")
             return False
     
-    def get_active_sessions(self) -> List[str]:
+    async def get_active_sessions(self) -> List[str]:
         """Get list of active session IDs"""
-        return list(self.session_histories.keys())
\ No newline at end of file
+        return await self.session_store.active_sessions()
+    
+    async def close(self):
+        """Release the HTTP clients and the session store connections"""
+        await self._http.aclose()
+        await self.rag_evaluator.close()
+        await self.session_store.close()
@@ -2,9 +2,10 @@ import logging
 import time
 from typing import List, Optional
 from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+import orjson
 
-from com.mhire.app.common.network_responses import NetworkResponse, HTTPCode
+from com.mhire.app.common.network_responses import NetworkResponse, HTTPCode, ORJSONResponse
 from com.mhire.app.services.ai_chatbot.ai_chatbot import AIChatbot
 from com.mhire.app.services.ai_chatbot.ai_chatbot_schema import (
     ChatRequest,
@@ -20,38 +21,36 @@ logger = logging.getLogger(__name__)
 router = APIRouter(
     prefix="/api/v1",
     tags=["AI Chatbot"],
-    responses={404: {"description": "Not found"}}
+    responses={404: {"description": "Not found"}},
+    default_response_class=ORJSONResponse
 )
 
 # Initialize AI chatbot
 ai_chatbot = AIChatbot()
 
-@router.post("/chat", response_model=dict)
+# Stateless response builder shared by every handler
+network_response = NetworkResponse()
+
+# ChatEvaluationResponse fields that are not part of the evaluation response data
+EVALUATION_DATA_EXCLUDE = {
+    "success": True,
+    "message": True,
+    "processing_time": True,
+    "relevance": {"individual_scores"}
+}
+
+@router.post("/chat", response_model=None)
 async def chat_with_ai(request: ChatRequest):
     """
     Chat with AI using RAG (Retrieval Augmented Generation).
     Supports Bengali, English, and mixed (Banglish) conversations.
     Maintains session history for context-aware responses.
     """
-    start_time = time.time()
-    network_response = NetworkResponse()
+    start_time = time.perf_counter()
     
     try:
         logger.info(f"Received chat request for session: {request.session_id}")
         
-        # Validate input
-        if not request.message.strip():
-            raise HTTPException(
-                status_code=HTTPCode.BAD_REQUEST,
-                detail="Message cannot be empty"
-            )
-        
-        if not request.session_id.strip():
-            raise HTTPException(
-                status_code=HTTPCode.BAD_REQUEST,
-                detail="Session ID cannot be empty"
-            )
-        
         # Process chat request
         result = await ai_chatbot.process_chat_request(request)
         
@@ -64,7 +63,7 @@ async def chat_with_ai(request: ChatRequest):
                     "session_id": result.session_id,
                     "language_detected": result.language_detected,
                     "sources_used": result.sources_used,
-                    "processing_time": f"{result.processing_time}s"
+                    "processing_time": f"{result.processing_time:.2f}s"
                 },
                 resource="/api/v1/chat",
                 start_time=start_time
@@ -88,7 +87,29 @@ async def chat_with_ai(request: ChatRequest):
             start_time=start_time
         )
 
-@router.post("/chat/evaluation", response_model=dict)
+def format_sse(event: str, data) -> bytes:
+    """Encode one Server-Sent Event"""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+@router.post("/chat/stream")
+async def chat_with_ai_stream(request: ChatRequest):
+    """
+    Chat with AI like /chat, but stream the answer as Server-Sent Events.
+    Events: metadata (language and sources), token (answer text deltas), done or error.
+    """
+    logger.info(f"Received streaming chat request for session: {request.session_id}")
+    
+    async def event_generator():
+        async for event in ai_chatbot.stream_chat_request(request):
+            yield format_sse(event["event"], event["data"])
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/chat/evaluation", response_model=None)
 async def evaluate_chat_with_ai(request: ChatEvaluationRequest):
     """
     Evaluate RAG system performance with comprehensive metrics.
@@ -99,31 +120,11 @@ async def evaluate_chat_with_ai(request: ChatEvaluationRequest):
     
     Supports Bengali, English, and mixed (Banglish) conversations.
     """
-    start_time = time.time()
-    network_response = NetworkResponse()
+    start_time = time.perf_counter()
     
     try:
         logger.info(f"Received chat evaluation request for session: {request.session_id}")
         
-        # Validate input
-        if not request.message.strip():
-            raise HTTPException(
-                status_code=HTTPCode.BAD_REQUEST,
-                detail="Message cannot be empty"
-            )
-        
-        if not request.session_id.strip():
-            raise HTTPException(
-                status_code=HTTPCode.BAD_REQUEST,
-                detail="Session ID cannot be empty"
-            )
-        
-        if not request.expected_answer.strip():
-            raise HTTPException(
-                status_code=HTTPCode.BAD_REQUEST,
-                detail="Expected answer cannot be empty for evaluation"
-            )
-        
         # Process chat evaluation
         result = await ai_chatbot.process_chat_evaluation(request)
         
@@ -132,22 +133,8 @@ async def evaluate_chat_with_ai(request: ChatEvaluationRequest):
                 http_code=HTTPCode.SUCCESS,
                 message=result.message,
                 data={
-                    "actual_answer": result.actual_answer,
-                    "session_id": result.session_id,
-                    "overall_score": result.overall_score,
-                    "quality": result.quality,
-                    "groundedness": {
-                        "score": result.groundedness.score,
-                        "analysis": result.groundedness.analysis,
-                        "supported": result.groundedness.supported
-                    } if result.groundedness else None,
-                    "relevance": {
-                        "score": result.relevance.score,
-                        "analysis": result.relevance.analysis,
-                        "relevant_docs": result.relevance.relevant_docs,
-                        "total_docs": result.relevance.total_docs
-                    } if result.relevance else None,
-                    "processing_time": f"{result.processing_time}s"
+                    **result.model_dump(exclude=EVALUATION_DATA_EXCLUDE),
+                    "processing_time": f"{result.processing_time:.2f}s"
                 },
                 resource="/api/v1/chat/evaluation",
                 start_time=start_time
@@ -169,4 +156,67 @@ async def evaluate_chat_with_ai(request: ChatEvaluationRequest):
             error_message=f"Internal server error: {str(e)}",
             resource="/api/v1/chat/evaluation",
             start_time=start_time
-        )
\ No newline at end of file
+        )
+@router.post("/chat/evaluation/groundedness/flush", response_model=None)
+async def flush_deferred_groundedness():
+    """
+    Score the groundedness judgments queued by deferred evaluations (DEFER_GROUNDEDNESS).
+    With USE_BATCH_API they are submitted as a Batch API job and stored by a later call.
+    Meant to be called periodically, e.g. by a nightly cron job.
+    """
+    start_time = time.perf_counter()
+    
+    try:
+        counts = await ai_chatbot.flush_deferred_groundedness()
+        
+        return network_response.success_response(
+            http_code=HTTPCode.SUCCESS,
+            message=f"Scored {counts['scored']} and submitted {counts['submitted']} deferred groundedness judgments",
+            data=counts,
+            resource="/api/v1/chat/evaluation/groundedness/flush",
+            start_time=start_time
+        )
+        
+    except Exception as e:
+        logger.error(f"Unexpected error in flush_deferred_groundedness: {e}")
+        return network_response.json_response(
+            http_code=HTTPCode.INTERNAL_SERVER_ERROR,
+            error_message=f"Internal server error: {str(e)}",
+            resource="/api/v1/chat/evaluation/groundedness/flush",
+            start_time=start_time
+        )
+
+@router.get("/chat/evaluation/{evaluation_id}/groundedness", response_model=None)
+async def get_deferred_groundedness(evaluation_id: str):
+    """
+    Status ("pending", "processing", "submitted" to a batch, or "done") and groundedness result of a deferred evaluation.
+    """
+    start_time = time.perf_counter()
+    
+    try:
+        result = await ai_chatbot.get_deferred_groundedness(evaluation_id)
+        
+        if result is None:
+            return network_response.json_response(
+                http_code=HTTPCode.NOT_FOUND,
+                error_message=f"No deferred evaluation found: {evaluation_id}",
+                resource=f"/api/v1/chat/evaluation/{evaluation_id}/groundedness",
+                start_time=start_time
+            )
+        
+        return network_response.success_response(
+            http_code=HTTPCode.SUCCESS,
+            message="Deferred groundedness retrieved successfully",
+            data={"evaluation_id": evaluation_id, **result},
+            resource=f"/api/v1/chat/evaluation/{evaluation_id}/groundedness",
+            start_time=start_time
+        )
+        
+    except Exception as e:
+        logger.error(f"Unexpected error in get_deferred_groundedness: {e}")
+        return network_response.json_response(
+            http_code=HTTPCode.INTERNAL_SERVER_ERROR,
+            error_message=f"Internal server error: {str(e)}",
+            resource=f"/api/v1/chat/evaluation/{evaluation_id}/groundedness",
+            start_time=start_time
+        )
@@ -1,16 +1,32 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
+import time
+from dataclasses import dataclass, field
 from typing import List, Optional, Dict, Any
-from datetime import datetime
 
-class ChatMessage(BaseModel):
-    role: str = Field(..., description="Role of the message sender (user/assistant)")
-    content: str = Field(..., description="Content of the message")
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+def epoch_ms() -> int:
+    """Current time as integer milliseconds since the epoch"""
+    return time.time_ns() // 1_000_000
+
+def require_non_blank(value: str, info: ValidationInfo) -> str:
+    """Reject empty or whitespace-only request fields while the body is parsed"""
+    value = value.strip()
+    if not value:
+        raise ValueError(f"{info.field_name} cannot be empty")
+    return value
+
+@dataclass(frozen=True, slots=True)
+class ChatMessage:
+    """Stored chat message: built by our own code, never parsed from a request"""
+    role: str  # Role of the message sender (user/assistant)
+    content: str  # Content of the message
+    timestamp_ms: int = field(default_factory=epoch_ms)
 
 class ChatRequest(BaseModel):
     message: str = Field(..., description="User's message/question")
     session_id: str = Field(..., description="Unique session identifier for conversation history")
 
+    _non_blank = field_validator("message", "session_id")(require_non_blank)
+
 class ChatResponse(BaseModel):
     success: bool
     message: str
@@ -23,8 +39,8 @@ class ChatResponse(BaseModel):
 class SessionHistory(BaseModel):
     session_id: str
     messages: List[ChatMessage] = Field(default_factory=list)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    last_updated: datetime = Field(default_factory=datetime.utcnow)
+    created_at_ms: int = Field(default_factory=epoch_ms)
+    last_updated_ms: int = Field(default_factory=epoch_ms)
     language_preference: Optional[str] = None
 
 class RAGContext(BaseModel):
@@ -39,6 +55,8 @@ class ChatEvaluationRequest(BaseModel):
     session_id: str = Field(..., description="Unique session identifier")
     expected_answer: str = Field(..., description="Expected correct answer for evaluation")
 
+    _non_blank = field_validator("message", "session_id", "expected_answer")(require_non_blank)
+
 class GroundednessEvaluation(BaseModel):
     score: float = Field(..., description="Groundedness score (0.0-1.0)")
     analysis: str = Field(..., description="Analysis of how well the answer is supported by context")
@@ -60,4 +78,6 @@ class ChatEvaluationResponse(BaseModel):
     quality: Optional[str] = None
     groundedness: Optional[GroundednessEvaluation] = None
     relevance: Optional[RelevanceEvaluation] = None
+    # Set when groundedness is deferred: key of the result stored by the next flush
+    evaluation_id: Optional[str] = None
     processing_time: Optional[float] = None
\ No newline at end of file
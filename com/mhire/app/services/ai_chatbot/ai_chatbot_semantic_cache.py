@@ -0,0 +1,94 @@
+import hashlib
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Cosine similarity above which a cached answer is reused for a new query
+SIMILARITY_THRESHOLD = 0.95
+
+# Entries kept in total; the oldest entry is overwritten once full
+MAX_ENTRIES = 1000
+
+# Cached answers older than this are ignored
+CACHE_TTL_SECONDS = 60 * 60
+
+def context_digest(context: str) -> str:
+    """
+    Digest of a retrieved RAG context. The context lists every source (file and chunk) with its
+    text, so equal digests mean the same sources with the same content were retrieved
+    """
+    return hashlib.sha256(context.encode()).hexdigest()
+
+class SemanticCache:
+    """
+    In-process semantic cache of chatbot answers. Entries are keyed by (language, context digest):
+    a query whose embedding is close enough to a previously answered query reuses that answer
+    only when the same sources were retrieved for it, so an answer grounded in other documents
+    (another corpus or filter, or documents changed since) is never served.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SIMILARITY_THRESHOLD,
+        max_entries: int = MAX_ENTRIES,
+        ttl_seconds: int = CACHE_TTL_SECONDS
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Ring buffer of normalized query embeddings, allocated on the first add
+        self.vectors: Optional[np.ndarray] = None
+        # Per slot: (key, response, stored_at)
+        self.entries: List[Optional[Tuple[Tuple[str, str], str, float]]] = [None] * max_entries
+        self.slots_by_key: Dict[Tuple[str, str], List[int]] = {}
+        self.next_slot = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, language: str, context_key: str, query_embedding: List[float]) -> Optional[str]:
+        """Return the cached answer of the most similar query over the same context, if similar enough"""
+        slots = self.slots_by_key.get((language, context_key))
+        if not slots:
+            return None
+
+        scores = self.vectors[slots] @ self._normalize(query_embedding)
+        best = int(np.argmax(scores))
+        _, response, stored_at = self.entries[slots[best]]
+
+        if scores[best] < self.threshold or time.monotonic() - stored_at > self.ttl_seconds:
+            return None
+
+        logger.info(f"Semantic cache hit (similarity {scores[best]:.4f})")
+        return response
+
+    def add(self, language: str, context_key: str, query_embedding: List[float], response: str):
+        """Cache the answer generated for a query over a context"""
+        if self.vectors is None:
+            self.vectors = np.zeros((self.max_entries, len(query_embedding)), dtype=np.float32)
+
+        slot = self.next_slot
+        evicted = self.entries[slot]
+        if evicted is not None:
+            evicted_slots = self.slots_by_key[evicted[0]]
+            evicted_slots.remove(slot)
+            if not evicted_slots:
+                del self.slots_by_key[evicted[0]]
+
+        key = (language, context_key)
+        self.vectors[slot] = self._normalize(query_embedding)
+        self.entries[slot] = (key, response, time.monotonic())
+        self.slots_by_key.setdefault(key, []).append(slot)
+        self.next_slot = (slot + 1) % self.max_entries
+
+    def clear(self):
+        """Forget every cached answer, called whenever stored documents change"""
+        self.entries = [None] * self.max_entries
+        self.slots_by_key.clear()
+        self.next_slot = 0
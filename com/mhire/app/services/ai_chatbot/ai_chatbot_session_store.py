@@ -0,0 +1,189 @@
+import logging
+from collections import deque
+from itertools import islice
+from typing import Deque, List, Optional, Tuple
+import orjson
+from cachetools import TTLCache
+
+from com.mhire.app.config.config import Config
+from com.mhire.app.services.ai_chatbot.ai_chatbot_schema import ChatMessage, SessionHistory, epoch_ms
+
+logger = logging.getLogger(__name__)
+
+# Sessions expire after a day without activity
+SESSION_TTL_SECONDS = 24 * 60 * 60
+
+# Only the most recent messages of a session are kept in its history
+MAX_STORED_MESSAGES = 50
+
+# Conversation exchanges (user + assistant pairs) kept in a session's memory
+MEMORY_WINDOW_EXCHANGES = 5
+
+# Sessions kept by the in-memory store; the least recently used one is evicted beyond this
+MAX_IN_MEMORY_SESSIONS = 10_000
+
+class InMemorySessionStore:
+    """Per-process session storage, used when no Redis URL is configured"""
+
+    def __init__(self, max_sessions: int = MAX_IN_MEMORY_SESSIONS, ttl_seconds: int = SESSION_TTL_SECONDS):
+        # Bounded and expiring, so abandoned sessions do not accumulate in the process.
+        # Handlers only touch these between awaits, so no lock is needed on the event loop.
+        self.session_memories: TTLCache = TTLCache(maxsize=max_sessions, ttl=ttl_seconds)
+        self.session_histories: TTLCache = TTLCache(maxsize=max_sessions, ttl=ttl_seconds)
+
+    def get_or_create_session_memory(self, session_id: str) -> Deque[Tuple[str, str]]:
+        """Get or create conversation memory for a session: (role, content) of the latest exchanges"""
+        if session_id not in self.session_memories:
+            self.session_memories[session_id] = deque(maxlen=2 * MEMORY_WINDOW_EXCHANGES)
+            self.session_histories[session_id] = SessionHistory(session_id=session_id)
+
+        return self.session_memories[session_id]
+
+    def add_message_to_history(self, session_id: str, role: str, content: str, language: str = None):
+        """Add message to session history"""
+        history = self.session_histories.get(session_id)
+        if history is None:
+            history = self.session_histories[session_id] = SessionHistory(session_id=session_id)
+
+        history.messages.append(ChatMessage(role=role, content=content))
+        del history.messages[:-MAX_STORED_MESSAGES]
+        history.last_updated_ms = epoch_ms()
+
+        if language and not history.language_preference:
+            history.language_preference = language
+
+    async def get_chat_history(self, session_id: str, limit: int = 5) -> List[Tuple[str, str]]:
+        """Most recent conversation messages of a session as (role, content), oldest first"""
+        memory = self.get_or_create_session_memory(session_id)
+        return list(islice(memory, max(len(memory) - limit, 0), None))
+
+    async def add_turn(self, session_id: str, user_message: str, ai_response: str, language: str = None):
+        """Store one user/assistant exchange"""
+        memory = self.get_or_create_session_memory(session_id)
+        # The deque's maxlen drops the oldest exchange once the window is full
+        memory.append(("user", user_message))
+        memory.append(("assistant", ai_response))
+
+        self.add_message_to_history(session_id, "user", user_message, language)
+        self.add_message_to_history(session_id, "assistant", ai_response)
+
+        # Re-assigning restarts the expiry, so sessions expire after inactivity rather than creation
+        self.session_memories[session_id] = memory
+        self.session_histories[session_id] = self.session_histories.pop(session_id)
+
+    async def get_history(self, session_id: str) -> Optional[SessionHistory]:
+        """Get session history"""
+        return self.session_histories.get(session_id)
+
+    async def clear(self, session_id: str) -> bool:
+        """Clear session memory and history"""
+        self.session_memories.pop(session_id, None)
+        self.session_histories.pop(session_id, None)
+        return True
+
+    async def active_sessions(self) -> List[str]:
+        """Get list of active session IDs"""
+        return list(self.session_histories.keys())
+
+    async def close(self):
+        """Nothing to release for in-process storage"""
+        pass
+
+class RedisSessionStore:
+    """
+    Session storage shared by every worker through Redis.
+    sess:{id}:msgs is a capped list of serialized ChatMessage (newest first) and
+    sess:{id}:hist a hash with the session metadata; both expire after SESSION_TTL_SECONDS.
+    """
+
+    def __init__(self, redis_url: str, ttl_seconds: int = SESSION_TTL_SECONDS, max_messages: int = MAX_STORED_MESSAGES):
+        # Imported here so redis is only needed when a Redis URL is configured
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(redis_url, decode_responses=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+
+    @staticmethod
+    def _messages_key(session_id: str) -> str:
+        return f"sess:{session_id}:msgs"
+
+    @staticmethod
+    def _history_key(session_id: str) -> str:
+        return f"sess:{session_id}:hist"
+
+    async def get_chat_history(self, session_id: str, limit: int = 5) -> List[Tuple[str, str]]:
+        """Most recent conversation messages of a session as (role, content), oldest first"""
+        raw_messages = await self.redis.lrange(self._messages_key(session_id), 0, limit - 1)
+
+        chat_history = []
+        for raw_message in reversed(raw_messages):
+            message = orjson.loads(raw_message)
+            chat_history.append((message["role"], message["content"]))
+
+        return chat_history
+
+    async def add_turn(self, session_id: str, user_message: str, ai_response: str, language: str = None):
+        """Store one user/assistant exchange and refresh the session expiry"""
+        messages_key = self._messages_key(session_id)
+        history_key = self._history_key(session_id)
+        now = epoch_ms()
+
+        pipe = self.redis.pipeline(transaction=False)
+        # LPUSH keeps the newest message at the head of the list
+        pipe.lpush(
+            messages_key,
+            orjson.dumps(ChatMessage(role="user", content=user_message)),
+            orjson.dumps(ChatMessage(role="assistant", content=ai_response))
+        )
+        pipe.ltrim(messages_key, 0, self.max_messages - 1)
+        pipe.hsetnx(history_key, "created_at_ms", now)
+        pipe.hset(history_key, "last_updated_ms", now)
+        if language:
+            pipe.hsetnx(history_key, "language_preference", language)
+        pipe.expire(messages_key, self.ttl_seconds)
+        pipe.expire(history_key, self.ttl_seconds)
+        await pipe.execute()
+
+    async def get_history(self, session_id: str) -> Optional[SessionHistory]:
+        """Get session history"""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(self._history_key(session_id))
+        pipe.lrange(self._messages_key(session_id), 0, -1)
+        metadata, raw_messages = await pipe.execute()
+
+        if not metadata:
+            return None
+
+        return SessionHistory(
+            session_id=session_id,
+            messages=[ChatMessage(**orjson.loads(raw_message)) for raw_message in reversed(raw_messages)],
+            created_at_ms=metadata["created_at_ms"],
+            last_updated_ms=metadata["last_updated_ms"],
+            language_preference=metadata.get("language_preference")
+        )
+
+    async def clear(self, session_id: str) -> bool:
+        """Clear session memory and history"""
+        await self.redis.delete(self._messages_key(session_id), self._history_key(session_id))
+        return True
+
+    async def active_sessions(self) -> List[str]:
+        """Get list of active session IDs"""
+        return [
+            key[len("sess:"):-len(":hist")]
+            async for key in self.redis.scan_iter(match="sess:*:hist")
+        ]
+
+    async def close(self):
+        """Close the Redis connection pool"""
+        await self.redis.aclose()
+
+def create_session_store(config: Config):
+    """Redis-backed store when REDIS_URL is configured, in-process storage otherwise"""
+    if config.redis_url:
+        logger.info("Using Redis session store")
+        return RedisSessionStore(config.redis_url)
+
+    logger.info("Using in-memory session store")
+    return InMemorySessionStore()
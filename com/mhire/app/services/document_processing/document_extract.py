@@ -1,18 +1,43 @@
+import asyncio
+import logging
 import os
 import tempfile
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Any, Union
 from fastapi import HTTPException
-from com.mhire.app.config.config import Config
+from com.mhire.app.config.config import get_config
 from com.mhire.app.common.network_responses import HTTPCode
 from com.mhire.app.utils.extraction_utility.conversion_util import DocumentConverter
 from com.mhire.app.utils.extraction_utility.extraction_util import TextExtractor
 from com.mhire.app.utils.extraction_utility.divide_util import DocumentDivider
 
+logger = logging.getLogger(__name__)
+
+# Files of one request converted and sent to Document AI at the same time
+MAX_CONCURRENT_FILES = 8
+
+# Chunks of one large PDF sent to Document AI at the same time
+MAX_CONCURRENT_CHUNKS = 8
+
+# Combined text of a large PDF stays in memory up to this size, beyond it the spool moves to disk
+TEXT_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Temporary PDFs and chunk files are deleted in the background, off the extraction path
+_cleanup_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="file-cleanup")
+
+def _safe_unlink(file_path: str) -> None:
+    """Delete a temporary file, logging instead of raising when it cannot be removed"""
+    try:
+        os.remove(file_path)
+    except OSError as e:
+        logger.warning("Could not remove temporary file %s: %s", file_path, e)
+
 class DocumentProcessor:
     """Main processor that coordinates conversion → extract workflow"""
     
     def __init__(self):
-        self.config = Config()
+        self.config = get_config()
         self.converter = DocumentConverter()
         self.extractor = TextExtractor()
         self.divider = DocumentDivider(page_limit=25)  # Set page limit for Document AI
@@ -22,15 +47,13 @@ class DocumentProcessor:
         Process a single file through the complete workflow
         Returns detailed processing results
         """
-        
-        if not os.path.exists(file_path):
-            return self._create_error_result(file_path, "File does not exist")
+        filename = os.path.basename(file_path)
         
         # Initialize result structure
         result = {
             'success': False,
             'file_path': file_path,
-            'filename': os.path.basename(file_path),
+            'filename': filename,
             'extracted_text': '',
             'text_length': 0,
             'processing_steps': [],
@@ -58,7 +81,7 @@ class DocumentProcessor:
                 file_info['pages'] > self.divider.page_limit):
                 
                 # Process large PDF with chunking
-                result = self._process_large_pdf(pdf_file_path, result)
+                result = self._process_large_pdf(pdf_file_path, result, file_info)
             else:
                 # Process normally for small PDFs or non-PDFs
                 extraction_result = self.extractor.process_document(pdf_file_path)
@@ -79,86 +102,81 @@ class DocumentProcessor:
                     result['success'] = False
             
             # Clean up temporary PDF if it was created
-            if pdf_file_path != file_path and os.path.exists(pdf_file_path):
-                try:
-                    os.remove(pdf_file_path)
-                except:
-                    pass
+            if pdf_file_path != file_path:
+                _cleanup_executor.submit(_safe_unlink, pdf_file_path)
             
             return result
             
         except Exception as e:
-            error_msg = f"Error processing {os.path.basename(file_path)}: {str(e)}"
+            error_msg = f"Error processing {filename}: {str(e)}"
             result['error'] = error_msg
             result['success'] = False
             return result
     
-    def _process_large_pdf(self, pdf_file_path: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    def _process_large_pdf(self, pdf_file_path: str, result: Dict[str, Any], file_info: Dict[str, Any]) -> Dict[str, Any]:
         """
         Process a large PDF by dividing it into chunks, processing each chunk,
-        and then combining the results
+        and then combining the results. file_info is the divider's info already read for the PDF
         """
         try:
             # Divide the PDF into chunks
-            chunk_paths = self.divider.divide_pdf_into_chunks(
-                pdf_file_path, 
-                self.divider.get_file_info(pdf_file_path)['pages']
-            )
+            # Chunks are PDF bytes, or temporary file paths for chunks too large to keep in memory
+            chunks = self.divider.divide_pdf_into_chunks(pdf_file_path, file_info['pages'])
             
             result['processing_steps'].append({
                 'step': 'division',
                 'success': True,
-                'output': f"{len(chunk_paths)} chunks created",
-                'details': f"PDF divided into {len(chunk_paths)} chunks of max {self.divider.page_limit} pages each"
+                'output': f"{len(chunks)} chunks created",
+                'details': f"PDF divided into {len(chunks)} chunks of max {self.divider.page_limit} pages each"
             })
             
-            # Process each chunk
-            combined_text = ""
             chunk_results = []
             successful_chunks = 0
             failed_chunks = 0
             
-            for i, chunk_path in enumerate(chunk_paths):
-                print(f"Processing chunk {i+1}/{len(chunk_paths)}: {os.path.basename(chunk_path)}")
-                
-                # Extract text from this chunk
-                chunk_extraction_result = self.extractor.process_document(chunk_path)
-                
-                # Store chunk result
-                chunk_result = {
-                    'chunk_index': i+1,
-                    'chunk_path': chunk_path,
-                    'success': chunk_extraction_result['success'],
-                    'text_length': len(chunk_extraction_result.get('text', '')),
-                    'error': chunk_extraction_result.get('error')
-                }
-                chunk_results.append(chunk_result)
+            # Extract the chunks in parallel; map yields the results in page order as they complete.
+            # Each chunk's text is written to a spool file and released, so the chunk texts are
+            # never all held in memory next to the combined text
+            with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_CHUNKS, len(chunks))) as executor, \
+                    tempfile.SpooledTemporaryFile(max_size=TEXT_SPOOL_MAX_SIZE, mode='w+', encoding='utf-8') as spool:
+                chunk_extraction_results = executor.map(self._extract_chunk, chunks)
+                has_text = False
                 
-                # Add text from successful chunks
-                if chunk_extraction_result['success']:
-                    successful_chunks += 1
-                    if combined_text and chunk_extraction_result.get('text'):
-                        combined_text += "\n\n"
-                    combined_text += chunk_extraction_result.get('text', '')
-                else:
-                    failed_chunks += 1
+                for i, (chunk, chunk_extraction_result) in enumerate(zip(chunks, chunk_extraction_results)):
+                    # Store chunk result
+                    chunk_result = {
+                        'chunk_index': i+1,
+                        'chunk_path': chunk if isinstance(chunk, str) else None,
+                        'success': chunk_extraction_result['success'],
+                        'text_length': len(chunk_extraction_result.get('text', '')),
+                        'error': chunk_extraction_result.get('error')
+                    }
+                    chunk_results.append(chunk_result)
+                    
+                    # Add text from successful chunks
+                    if chunk_extraction_result['success']:
+                        successful_chunks += 1
+                        if chunk_extraction_result.get('text'):
+                            if has_text:
+                                spool.write("\n\n")
+                            spool.write(chunk_extraction_result['text'])
+                            has_text = True
+                    else:
+                        failed_chunks += 1
                 
-                # Clean up temporary chunk file
-                try:
-                    os.remove(chunk_path)
-                except Exception as e:
-                    print(f"Warning: Could not remove temporary chunk file {chunk_path}: {str(e)}")
+                spool.seek(0)
+                combined_text = spool.read()
             
             # Update result with combined information
             result['processing_steps'].append({
                 'step': 'chunked_extraction',
                 'success': successful_chunks > 0,
                 'output': {
-                    'total_chunks': len(chunk_paths),
+                    'total_chunks': len(chunks),
                     'successful_chunks': successful_chunks,
                     'failed_chunks': failed_chunks
                 },
-                'details': f"Processed {successful_chunks}/{len(chunk_paths)} chunks successfully"
+                'details': f"Processed {successful_chunks}/{len(chunks)} chunks successfully"
             })
             
             # Set overall result based on chunk processing
@@ -167,7 +185,7 @@ class DocumentProcessor:
                 result['extracted_text'] = combined_text
                 result['text_length'] = len(combined_text)
                 result['metadata']['chunked_processing'] = True
-                result['metadata']['total_chunks'] = len(chunk_paths)
+                result['metadata']['total_chunks'] = len(chunks)
                 result['metadata']['successful_chunks'] = successful_chunks
                 result['metadata']['failed_chunks'] = failed_chunks
             else:
@@ -182,9 +200,31 @@ class DocumentProcessor:
             result['success'] = False
             return result
     
-    def process_multiple_files(self, file_paths: List[str]) -> Dict[str, Any]:
+    def _extract_chunk(self, chunk: Union[str, bytes]) -> Dict[str, Any]:
+        """
+        Extract text from one PDF chunk, given as its bytes or as a temporary file path.
+        A temporary chunk file is scheduled for removal afterwards
+        """
+        if isinstance(chunk, bytes):
+            logger.debug("Processing in-memory chunk (%s bytes)", len(chunk))
+            try:
+                return self.extractor.process_content(chunk, 'application/pdf')
+            except Exception as e:
+                return {'success': False, 'text': '', 'error': str(e)}
+        
+        logger.debug("Processing chunk: %s", os.path.basename(chunk))
+        
+        try:
+            return self.extractor.process_document(chunk)
+        except Exception as e:
+            return {'success': False, 'text': '', 'error': str(e)}
+        finally:
+            # Clean up temporary chunk file
+            _cleanup_executor.submit(_safe_unlink, chunk)
+    
+    async def process_multiple_files(self, file_paths: List[str]) -> Dict[str, Any]:
         """
-        Process multiple files and return comprehensive results
+        Process multiple files concurrently and return comprehensive results
         """
         total_files = len(file_paths)
         
@@ -197,22 +237,36 @@ class DocumentProcessor:
             'combined_text': ''
         }
         
-        # Process each file individually
-        for i, file_path in enumerate(file_paths, 1):
-            file_result = self.process_single_file(file_path)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_FILES)
+        
+        async def process_guarded(file_path: str) -> Dict[str, Any]:
+            async with semaphore:
+                # Conversion and Document AI calls block, so run them in worker threads
+                return await asyncio.to_thread(self.process_single_file, file_path)
+        
+        file_results = await asyncio.gather(
+            *(process_guarded(file_path) for file_path in file_paths),
+            return_exceptions=True
+        )
+        
+        # Combine the results in upload order
+        text_sections = []
+        for i, (file_path, file_result) in enumerate(zip(file_paths, file_results), 1):
+            if isinstance(file_result, Exception):
+                file_result = self._create_error_result(
+                    file_path, f"Error processing {os.path.basename(file_path)}: {str(file_result)}"
+                )
             results['individual_results'].append(file_result)
             
             if file_result['success']:
                 results['successful_files'] += 1
                 if file_result['extracted_text']:
-                    if results['combined_text']:
-                        results['combined_text'] += f"\n\n=== FILE {i}: {file_result['filename']} ===\n\n"
-                    else:
-                        results['combined_text'] = f"=== FILE {i}: {file_result['filename']} ===\n\n"
-                    results['combined_text'] += file_result['extracted_text']
+                    text_sections.append(f"=== FILE {i}: {file_result['filename']} ===\n\n{file_result['extracted_text']}")
             else:
                 results['failed_files'] += 1
         
+        results['combined_text'] = "\n\n".join(text_sections)
+        
         # Overall success if at least one file was processed successfully
         if results['failed_files'] > 0:
             results['success'] = results['successful_files'] > 0
@@ -237,4 +291,9 @@ class DocumentProcessor:
         return {
             'converter_available': True,
             'extractor_status': self.extractor.validate_document_ai_setup()
-        }
\ No newline at end of file
+        }
+
+@lru_cache(maxsize=1)
+def get_document_processor() -> DocumentProcessor:
+    """Build the processor (and its Document AI client) once per process and reuse it for every request"""
+    return DocumentProcessor()
@@ -2,21 +2,25 @@ import time
 import tempfile
 import os
 from typing import List
+import aiofiles
 from fastapi import APIRouter, UploadFile, File, HTTPException, Request
-from com.mhire.app.common.network_responses import NetworkResponse, HTTPCode
-from com.mhire.app.services.document_processing.document_extract import DocumentProcessor
+from com.mhire.app.common.network_responses import NetworkResponse, HTTPCode, ORJSONResponse
+from com.mhire.app.services.document_processing.document_extract import get_document_processor
 from com.mhire.app.services.document_processing.document_extract_schema import DocumentExtractionResponse
 
-router = APIRouter(prefix="/api/v1", tags=["document-extraction"])
+router = APIRouter(prefix="/api/v1", tags=["document-extraction"], default_response_class=ORJSONResponse)
 network_response = NetworkResponse()
 
+# Uploads are copied to disk in pieces of this size instead of being read into memory whole
+UPLOAD_CHUNK_SIZE = 1 << 20
+
 @router.post("/extract", response_model=DocumentExtractionResponse)
 async def extract_text(http_request: Request, files: List[UploadFile] = File(...)):
     """
     Extract text from one or more documents using Document AI.
     Supports various file formats and automatically converts them to PDF.
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     try:
         # Validate files
@@ -26,8 +30,8 @@ async def extract_text(http_request: Request, files: List[UploadFile] = File(...
                 detail="No files provided"
             )
 
-        # Initialize processor
-        processor = DocumentProcessor()
+        # Shared processor, its Document AI client is reused across requests
+        processor = get_document_processor()
         
         # Use temporary directory instead of creating uploads folder
         with tempfile.TemporaryDirectory() as temp_dir:
@@ -44,9 +48,9 @@ async def extract_text(http_request: Request, files: List[UploadFile] = File(...
                 file_path = os.path.join(temp_dir, file.filename)
                 try:
                     # Save file
-                    with open(file_path, "wb") as buffer:
-                        content = await file.read()
-                        buffer.write(content)
+                    async with aiofiles.open(file_path, "wb") as buffer:
+                        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                            await buffer.write(chunk)
                     processed_files.append(file_path)
                 except Exception as e:
                     raise HTTPException(
@@ -55,7 +59,7 @@ async def extract_text(http_request: Request, files: List[UploadFile] = File(...
                     )
 
             # Process all files
-            result = processor.process_multiple_files(processed_files)
+            result = await processor.process_multiple_files(processed_files)
 
             # Format response data
             response_data = {
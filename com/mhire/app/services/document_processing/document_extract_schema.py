@@ -32,4 +32,4 @@ class DocumentExtractionResponse(BaseModel):
     message: str = Field(..., description="Status message")
     data: ExtractExtractionData = Field(..., description="Extraction results")
     resource: str = Field(..., description="API endpoint resource path")
-    duration: str = Field(..., description="Processing duration")
+    duration_ms: int = Field(..., description="Processing duration in milliseconds")
@@ -2,27 +2,71 @@ import logging
 import openai
 import asyncio
 import re
+import hashlib
+import httpx
+import numpy as np
 from typing import List, Tuple, Optional
+from cachetools import LRUCache
 from langdetect import detect
-from com.mhire.app.config.config import Config
+from com.mhire.app.config.config import get_config
 
 logger = logging.getLogger(__name__)
 
+# Embedding requests in flight per EmbeddingCreator, to stay under the API rate limit
+MAX_CONCURRENT_EMBEDDING_REQUESTS = 8
+
+# Token budget per embeddings request, below the API's 300k tokens per request
+MAX_TOKENS_PER_REQUEST = 250_000
+
+# Query embeddings kept for repeated queries; the least recently used one is evicted beyond this
+QUERY_EMBEDDING_CACHE_SIZE = 10_000
+
+# Query embeddings persisted in Redis (when configured) survive restarts and are shared by workers
+QUERY_EMBEDDING_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Patterns used on every chunk of every document, compiled once
+_WS_RE = re.compile(r'\s+')
+_CLEAN_RE = re.compile(r'[^\u0980-\u09FF\w\s.,;:!?()\-\[\]০-৯0-9]')
+_SENT_END_RE = re.compile(r'[।.!?]\s+')
+
+# Anything preprocess_text would change apart from the ends: a removed character, whitespace
+# other than a single space, or a run of spaces
+_NEEDS_CLEANING_RE = re.compile(r'[^\u0980-\u09FF\w .,;:!?()\-\[\]০-৯0-9]|  ')
+
 class EmbeddingCreator:
     def __init__(self):
-        self.config = Config()
+        self.config = get_config()
+        # Pooled HTTP/2 connections reused by every embeddings call
+        self._http = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            timeout=httpx.Timeout(60.0)
+        )
         self.openai_client = openai.AsyncOpenAI(
-            api_key=self.config.openai_api_key
+            api_key=self.config.openai_api_key,
+            http_client=self._http
         )
         self.model = "text-embedding-3-small"  # Efficient and good for multilingual content
         self.max_tokens = 8000  # Safe limit for the model
+        self.batch_size = 128  # Max inputs per embeddings request (API accepts up to 2048)
+        self._embed_sem = asyncio.Semaphore(MAX_CONCURRENT_EMBEDDING_REQUESTS)
+        # Embeddings of recent queries by SHA-256 of the normalized query text
+        self._query_embeddings: LRUCache = LRUCache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+        self._redis = None
+        if self.config.redis_url:
+            # Imported here so redis is only needed when a Redis URL is configured
+            import redis.asyncio as redis
+            self._redis = redis.from_url(self.config.redis_url)
         
     def detect_language(self, text: str) -> Optional[str]:
         """Detect if text is Bengali, English, or mixed"""
         try:
-            # Count Bengali characters
-            bengali_chars = len(re.findall(r'[\u0980-\u09FF]', text))
-            english_chars = len(re.findall(r'[a-zA-Z]', text))
+            # Count Bengali and English letters over the code points in one vectorized pass
+            code_points = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+            bengali_chars = int(np.count_nonzero((code_points >= 0x0980) & (code_points <= 0x09FF)))
+            # Folding lowercase onto uppercase (clearing bit 0x20) matches both a-z and A-Z
+            upper = code_points & ~np.uint32(0x20)
+            english_chars = int(np.count_nonzero((upper >= ord("A")) & (upper <= ord("Z"))))
             total_chars = bengali_chars + english_chars
             
             if total_chars == 0:
@@ -44,17 +88,57 @@ class EmbeddingCreator:
     def preprocess_text(self, text: str) -> str:
         """Clean and preprocess text for better embedding quality - LESS AGGRESSIVE"""
         # Remove excessive whitespace but preserve structure
-        text = re.sub(r'\s+', ' ', text)
+        text = _WS_RE.sub(' ', text)
         
         # Keep more characters to preserve content structure
         # Only remove truly problematic characters, keep punctuation and numbers
-        text = re.sub(r'[^\u0980-\u09FF\w\s.,;:!?()\-\[\]০-৯0-9]', '', text)
+        text = _CLEAN_RE.sub('', text)
         
         # Strip leading/trailing whitespace
         text = text.strip()
         
         return text
     
+    def preprocess_and_detect(self, text: str) -> Tuple[str, str]:
+        """
+        Clean the text and detect its language.
+        Cleaning keeps every Bengali and ASCII letter, so the language is the same as for the raw text.
+        """
+        processed_text = self.preprocess_text(text)
+        return processed_text, self.detect_language(processed_text)
+    
+    def _chunk_end(self, text: str, current_pos: int, max_length: int) -> int:
+        """End position of the chunk starting at current_pos, at a sentence or word break when possible"""
+        # Calculate chunk end position
+        chunk_end = min(current_pos + max_length, len(text))
+        
+        # If this is not the last chunk, try to find a good break point
+        if chunk_end < len(text):
+            # Look for sentence endings within the last 500 characters
+            search_start = max(chunk_end - 500, current_pos)
+            chunk_text = text[search_start:chunk_end]
+            
+            # Find the sentence endings (Bengali dari, full stop, ! or ?) in one scan
+            sentence_endings = [search_start + match.end() for match in _SENT_END_RE.finditer(chunk_text)]
+            
+            if sentence_endings:
+                # Use the last sentence ending as break point
+                chunk_end = max(sentence_endings)
+            else:
+                # If no sentence ending found, look for word boundaries
+                search_text = text[chunk_end-100:chunk_end]
+                word_boundaries = [m.start() for m in _WS_RE.finditer(search_text)]
+                if word_boundaries:
+                    chunk_end = chunk_end - 100 + word_boundaries[-1]
+        
+        return chunk_end
+    
+    def _first_chunk(self, text: str, max_length: int = 5500) -> str:
+        """First chunk chunk_text would produce, without chunking the rest of the text"""
+        if len(text) <= max_length:
+            return text
+        return text[:self._chunk_end(text, 0, max_length)].strip()
+    
     def chunk_text(self, text: str, max_length: int = 5500) -> List[str]:
         """Split text into optimal chunks of 5000-6000 characters"""
         if len(text) <= max_length:
@@ -64,30 +148,7 @@ class EmbeddingCreator:
         current_pos = 0
         
         while current_pos < len(text):
-            # Calculate chunk end position
-            chunk_end = min(current_pos + max_length, len(text))
-            
-            # If this is not the last chunk, try to find a good break point
-            if chunk_end < len(text):
-                # Look for sentence endings within the last 500 characters
-                search_start = max(chunk_end - 500, current_pos)
-                chunk_text = text[search_start:chunk_end]
-                
-                # Find the last sentence ending
-                sentence_endings = []
-                for pattern in [r'।\s+', r'\.\s+', r'!\s+', r'\?\s+']:
-                    for match in re.finditer(pattern, chunk_text):
-                        sentence_endings.append(search_start + match.end())
-                
-                if sentence_endings:
-                    # Use the last sentence ending as break point
-                    chunk_end = max(sentence_endings)
-                else:
-                    # If no sentence ending found, look for word boundaries
-                    search_text = text[chunk_end-100:chunk_end]
-                    word_boundaries = [m.start() for m in re.finditer(r'\s+', search_text)]
-                    if word_boundaries:
-                        chunk_end = chunk_end - 100 + word_boundaries[-1]
+            chunk_end = self._chunk_end(text, current_pos, max_length)
             
             # Extract the chunk
             chunk = text[current_pos:chunk_end].strip()
@@ -101,18 +162,14 @@ class EmbeddingCreator:
     async def create_embedding(self, text: str) -> Tuple[List[float], str]:
         """Create embedding for the given text - DEPRECATED: Use create_embeddings_for_chunks instead"""
         try:
-            # Preprocess text
-            processed_text = self.preprocess_text(text)
-            
-            # Detect language
-            language = self.detect_language(processed_text)
+            # Preprocess text and detect language
+            processed_text, language = self.preprocess_and_detect(text)
             
             if not processed_text.strip():
                 raise ValueError("Text is empty after preprocessing")
             
             # For backward compatibility, use first chunk only
-            chunks = self.chunk_text(processed_text)
-            main_text = chunks[0]  # Use first chunk for embedding
+            main_text = self._first_chunk(processed_text)
             
             logger.info(f"Creating embedding for text of length {len(main_text)}, language: {language}")
             
@@ -131,56 +188,83 @@ class EmbeddingCreator:
             logger.error(f"Failed to create embedding: {e}")
             raise
 
-    async def create_embeddings_for_chunks(self, text: str) -> Tuple[List[Tuple[List[float], str, int]], str]:
+    def _pack_batches(self, texts: List[str]) -> List[List[str]]:
+        """
+        Split texts into as few requests as the limits allow: at most batch_size inputs and
+        MAX_TOKENS_PER_REQUEST tokens each. A text's UTF-8 length bounds its token count
+        (every token covers at least one byte), so Bengali chunks get smaller batches.
+        """
+        batches = []
+        batch: List[str] = []
+        batch_tokens = 0
+        
+        for text in texts:
+            text_tokens = len(text.encode("utf-8"))
+            if batch and (len(batch) == self.batch_size or batch_tokens + text_tokens > MAX_TOKENS_PER_REQUEST):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += text_tokens
+        
+        if batch:
+            batches.append(batch)
+        
+        return batches
+    
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Create embeddings for a list of texts in as few API calls as possible.
+        Batches are sent concurrently (bounded by the shared semaphore) and results are returned in input order.
+        """
+        batches = self._pack_batches(texts)
+        
+        async def embed_batch(batch: List[str]):
+            async with self._embed_sem:
+                return await self.openai_client.embeddings.create(input=batch, model=self.model)
+        
+        responses = await asyncio.gather(*[embed_batch(batch) for batch in batches])
+        
+        logger.info(f"Created embeddings for {len(texts)} texts in {len(batches)} requests")
+        
+        return [embedding_data.embedding for response in responses for embedding_data in response.data]
+
+    def prepare_chunks(self, text: str) -> Tuple[List[str], List[int], str]:
+        """
+        Preprocess, detect language and chunk the given text without embedding it
+        Returns: (list of chunk texts, list of chunk lengths, language)
+        """
+        # Preprocess text and detect language
+        processed_text, language = self.preprocess_and_detect(text)
+        
+        if not processed_text.strip():
+            raise ValueError("Text is empty after preprocessing")
+        
+        # Split text into chunks and measure each one once
+        chunks = self.chunk_text(processed_text)
+        lengths = [len(chunk) for chunk in chunks]
+        
+        logger.info(f"Prepared {len(chunks)} chunks, total length: {len(processed_text)}, language: {language}")
+        
+        # Log chunk sizes for debugging
+        for i, length in enumerate(lengths):
+            logger.info(f"Chunk {i+1}: {length} characters")
+        
+        return chunks, lengths, language
+
+    async def create_embeddings_for_chunks(self, text: str) -> Tuple[List[List[float]], List[str], List[int], str]:
         """
         Create embeddings for ALL chunks of the given text
-        Returns: (list of (embedding, chunk_text, chunk_index), language)
+        Returns: (embeddings, chunk texts, chunk lengths, language) as parallel lists in chunk order
         """
         try:
-            # Preprocess text
-            processed_text = self.preprocess_text(text)
-            
-            # Detect language
-            language = self.detect_language(processed_text)
-            
-            if not processed_text.strip():
-                raise ValueError("Text is empty after preprocessing")
-            
-            # Split text into chunks
-            chunks = self.chunk_text(processed_text)
+            chunks, lengths, language = self.prepare_chunks(text)
             
-            logger.info(f"Creating embeddings for {len(chunks)} chunks, total length: {len(processed_text)}, language: {language}")
+            # Create embeddings for all chunks, keeping chunk order
+            embeddings = await self.embed_texts(chunks)
             
-            # Log chunk sizes for debugging
-            for i, chunk in enumerate(chunks):
-                logger.info(f"Chunk {i+1}: {len(chunk)} characters")
+            logger.info(f"Successfully created {len(embeddings)} embeddings for all chunks")
             
-            # Create embeddings for all chunks
-            chunk_embeddings = []
-            
-            # Process chunks in batches to avoid rate limits
-            batch_size = 10  # Adjust based on API limits
-            for i in range(0, len(chunks), batch_size):
-                batch_chunks = chunks[i:i + batch_size]
-                
-                # Create embeddings for this batch
-                response = await self.openai_client.embeddings.create(
-                    input=batch_chunks,
-                    model=self.model
-                )
-                
-                # Store embeddings with chunk info
-                for j, embedding_data in enumerate(response.data):
-                    chunk_index = i + j
-                    embedding = embedding_data.embedding
-                    chunk_text = batch_chunks[j]
-                    chunk_embeddings.append((embedding, chunk_text, chunk_index))
-                
-                logger.info(f"Processed batch {i//batch_size + 1}/{(len(chunks) + batch_size - 1)//batch_size}")
-            
-            logger.info(f"Successfully created {len(chunk_embeddings)} embeddings for all chunks")
-            
-            return chunk_embeddings, language
+            return embeddings, chunks, lengths, language
             
         except Exception as e:
             logger.error(f"Failed to create embeddings for chunks: {e}")
@@ -192,10 +276,8 @@ class EmbeddingCreator:
             # Process texts
             processed_data = []
             for text in texts:
-                processed_text = self.preprocess_text(text)
-                language = self.detect_language(processed_text)
-                chunks = self.chunk_text(processed_text)
-                processed_data.append((chunks[0], language))
+                processed_text, language = self.preprocess_and_detect(text)
+                processed_data.append((self._first_chunk(processed_text), language))
             
             # Extract just the text for embedding
             texts_for_embedding = [data[0] for data in processed_data]
@@ -223,18 +305,92 @@ class EmbeddingCreator:
     async def create_query_embedding(self, query: str) -> List[float]:
         """Create embedding for search query"""
         try:
-            processed_query = self.preprocess_text(query)
+            # Typical queries are already clean: one search that stops at the first hit
+            # instead of two full substitutions
+            if _NEEDS_CLEANING_RE.search(query):
+                processed_query = self.preprocess_text(query)
+            else:
+                processed_query = query.strip()
             
             if not processed_query.strip():
                 raise ValueError("Query is empty after preprocessing")
             
+            # Repeated queries skip the embeddings API round trip
+            cache_key = hashlib.sha256(processed_query.lower().encode()).hexdigest()
+            cached_embedding = self._query_embeddings.get(cache_key)
+            if cached_embedding is not None:
+                return cached_embedding
+            
+            cached_embedding = await self._load_query_embedding(cache_key)
+            if cached_embedding is not None:
+                self._query_embeddings[cache_key] = cached_embedding
+                return cached_embedding
+            
             response = await self.openai_client.embeddings.create(
                 input=processed_query,
                 model=self.model
             )
             
-            return response.data[0].embedding
+            embedding = response.data[0].embedding
+            self._query_embeddings[cache_key] = embedding
+            await self._store_query_embedding(cache_key, embedding)
+            return embedding
             
         except Exception as e:
             logger.error(f"Failed to create query embedding: {e}")
-            raise
\ No newline at end of file
+            raise
+    
+    def _query_embedding_key(self, cache_key: str) -> str:
+        return f"qemb:{self.model}:{cache_key}"
+    
+    async def _load_query_embedding(self, cache_key: str) -> Optional[List[float]]:
+        """Query embedding persisted in Redis, if any; a Redis failure only costs the API call"""
+        if self._redis is None:
+            return None
+        
+        try:
+            raw_embedding = await self._redis.get(self._query_embedding_key(cache_key))
+        except Exception as e:
+            logger.warning(f"Could not read cached query embedding: {e}")
+            return None
+        
+        if raw_embedding is None:
+            return None
+        return np.frombuffer(raw_embedding, dtype=np.float32).tolist()
+    
+    async def _store_query_embedding(self, cache_key: str, embedding: List[float]):
+        """Persist a query embedding in Redis as float32 bytes"""
+        if self._redis is None:
+            return
+        
+        try:
+            await self._redis.set(
+                self._query_embedding_key(cache_key),
+                np.asarray(embedding, dtype=np.float32).tobytes(),
+                ex=QUERY_EMBEDDING_TTL_SECONDS
+            )
+        except Exception as e:
+            logger.warning(f"Could not cache query embedding: {e}")
+    
+    async def close(self):
+        """Close the pooled HTTP client and the Redis connections"""
+        await self._http.aclose()
+        if self._redis is not None:
+            await self._redis.aclose()
+
+# One creator (and connection pool) per process, shared by every component
+_embedding_creator: Optional[EmbeddingCreator] = None
+
+def get_embedding_creator() -> EmbeddingCreator:
+    """Return the shared EmbeddingCreator, creating it on first access"""
+    global _embedding_creator
+    if _embedding_creator is None:
+        _embedding_creator = EmbeddingCreator()
+    return _embedding_creator
+
+async def close_embedding_creator() -> None:
+    """Close the shared EmbeddingCreator's HTTP client"""
+    global _embedding_creator
+    if _embedding_creator is not None:
+        await _embedding_creator.close()
+        _embedding_creator = None
@@ -1,21 +1,151 @@
 import logging
-from typing import List, Dict, Any, Optional
+import time
+from datetime import datetime
+from typing import Callable, List, Dict, Any, Optional, Tuple
+import numpy as np
 from com.mhire.app.database.db_connection.db_connection import DBConnection
-from com.mhire.app.utils.embedding_utility.embedding_create import EmbeddingCreator
+from com.mhire.app.utils.embedding_utility.embedding_create import get_embedding_creator
 
 logger = logging.getLogger(__name__)
 
+# HNSW candidates explored per requested result: higher improves recall, lower cuts latency
+NUM_CANDIDATES_MULTIPLIER = 20
+
+# Cosine similarity above which a recent query's search results are reused for a new query
+RESULT_SIMILARITY_THRESHOLD = 0.97
+
+# Recent queries whose search results are kept; the oldest entry is overwritten once full
+RESULT_CACHE_SIZE = 128
+
+# Cached search results older than this are ignored
+RESULT_CACHE_TTL_SECONDS = 5 * 60
+
+class _ResultCache:
+    """Search results of recent queries, looked up by inner product over normalized query embeddings"""
+
+    def __init__(self, dimensions: int, max_entries: int = RESULT_CACHE_SIZE):
+        self.vectors = np.zeros((max_entries, dimensions), dtype=np.float32)
+        self.entries: List[Optional[Tuple[float, List[Dict[str, Any]]]]] = [None] * max_entries
+        self.max_entries = max_entries
+        self.size = 0
+        self.next_slot = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, query_embedding: List[float]) -> Optional[List[Dict[str, Any]]]:
+        if self.size == 0:
+            return None
+
+        scores = self.vectors[:self.size] @ self._normalize(query_embedding)
+        best = int(np.argmax(scores))
+        stored_at, documents = self.entries[best]
+
+        if scores[best] < RESULT_SIMILARITY_THRESHOLD or time.monotonic() - stored_at > RESULT_CACHE_TTL_SECONDS:
+            return None
+
+        return documents
+
+    def add(self, query_embedding: List[float], documents: List[Dict[str, Any]]):
+        slot = self.next_slot
+        self.vectors[slot] = self._normalize(query_embedding)
+        self.entries[slot] = (time.monotonic(), documents)
+        self.next_slot = (slot + 1) % self.max_entries
+        self.size = min(self.size + 1, self.max_entries)
+
+# Shared by every retriever in the process, one cache per search parameters
+# (limit, similarity_threshold, language, file_name, min_created_at)
+_result_caches: Dict[tuple, _ResultCache] = {}
+
+# Other caches derived from the stored documents (e.g. cached chatbot answers), cleared with the results
+_invalidation_callbacks: List[Callable[[], None]] = []
+
+def on_documents_changed(callback: Callable[[], None]):
+    """Register a callback run by clear_result_cache, to drop a cache derived from the stored documents"""
+    _invalidation_callbacks.append(callback)
+
+def clear_result_cache():
+    """Forget this process' cached search results and the caches derived from them"""
+    _result_caches.clear()
+    for callback in _invalidation_callbacks:
+        callback()
+
+# Generation of the stored documents, shared by every worker through MongoDB: writes increment it,
+# and a worker seeing a new value drops its caches before using them
+GENERATION_COLLECTION = "cache_generations"
+
+# Seconds a worker trusts the generation it last read, so searches don't pay a round trip each;
+# other workers' writes are picked up within this delay
+GENERATION_REFRESH_SECONDS = 5
+
+# Generation the cached results of this process belong to, and when it was read
+_cached_generation: Optional[int] = None
+_generation_read_at: Optional[float] = None
+
+async def _documents_generation(collection) -> Optional[int]:
+    """Current generation of the documents in a collection, None when it cannot be read"""
+    try:
+        document = await collection.database[GENERATION_COLLECTION].find_one(
+            {"_id": collection.name},
+            {"generation": 1}
+        )
+        return document["generation"] if document else 0
+    except Exception as e:
+        logger.warning(f"Could not read the documents generation, bypassing cached results: {e}")
+        return None
+
+async def _current_generation(collection) -> Optional[int]:
+    """Generation of a collection's documents, read from MongoDB at most every GENERATION_REFRESH_SECONDS"""
+    global _cached_generation, _generation_read_at
+    
+    now = time.monotonic()
+    if _generation_read_at is not None and now - _generation_read_at < GENERATION_REFRESH_SECONDS:
+        return _cached_generation
+    
+    # Cached results (and caches derived from them) are dropped once another
+    # worker, or this one, changed the stored documents
+    generation = await _documents_generation(collection)
+    if generation != _cached_generation:
+        clear_result_cache()
+        _cached_generation = generation
+    # An unreadable generation is retried on the next search
+    _generation_read_at = now if generation is not None else None
+    return generation
+
+async def mark_documents_changed(collection):
+    """Increment the shared generation of a collection's documents, called whenever they change"""
+    global _generation_read_at
+    
+    clear_result_cache()
+    try:
+        await collection.database[GENERATION_COLLECTION].update_one(
+            {"_id": collection.name},
+            {"$inc": {"generation": 1}},
+            upsert=True
+        )
+    except Exception as e:
+        logger.error(f"Failed to increment the documents generation: {e}")
+    # Re-read on the next search: results of searches that ran during the write are dropped then
+    _generation_read_at = None
+
 class EmbeddingRetriever:
-    def __init__(self):
-        self.db_connection = DBConnection()
-        self.embedding_creator = EmbeddingCreator()
+    def __init__(self, db_connection: Optional[DBConnection] = None):
+        self.db_connection = db_connection or DBConnection()
+        self.embedding_creator = get_embedding_creator()
         self.collection = self.db_connection.collection
         
     async def retrieve_similar_documents(
         self, 
         query_text: str, 
         limit: int = 5,  # Reduced from 10 to 5
-        similarity_threshold: float = 0.5
+        similarity_threshold: float = 0.5,
+        query_embedding: Optional[List[float]] = None,
+        language: Optional[str] = None,
+        file_name: Optional[str] = None,
+        min_created_at: Optional[datetime] = None
     ) -> List[Dict[str, Any]]:
         """
         Retrieve similar documents using vector search for RAG implementation.
@@ -24,6 +154,10 @@ class EmbeddingRetriever:
             query_text: The user's query text
             limit: Number of documents to retrieve (reduced to 5)
             similarity_threshold: Minimum similarity score
+            query_embedding: Precomputed embedding of query_text, created when not given
+            language: Only search chunks detected in this language
+            file_name: Only search chunks of this file
+            min_created_at: Only search chunks stored at or after this time
             
         Returns:
             List of relevant documents with metadata
@@ -31,65 +165,144 @@ class EmbeddingRetriever:
         try:
             logger.info(f"Retrieving documents for query: {query_text[:100]}...")
             
-            # Create query embedding
-            query_embedding = await self.embedding_creator.create_query_embedding(query_text)
+            # Create query embedding unless the caller already has one
+            if query_embedding is None:
+                query_embedding = await self.embedding_creator.create_query_embedding(query_text)
+            
+            # Drops the cached results once the stored documents changed
+            generation = await _current_generation(self.collection)
+            
+            # A near-identical recent query skips the vector search
+            cache_key = (limit, similarity_threshold, language, file_name, min_created_at)
+            result_cache = _result_caches.get(cache_key) if generation is not None else None
+            if result_cache is not None:
+                cached_results = result_cache.lookup(query_embedding)
+                if cached_results is not None:
+                    logger.info(f"Reusing {len(cached_results)} cached documents")
+                    return list(cached_results)
+            
+            vector_search = {
+                "index": "vector_index",
+                "path": "embedding",
+                "queryVector": query_embedding,
+                "numCandidates": limit * NUM_CANDIDATES_MULTIPLIER,
+                "limit": limit
+            }
+            
+            # Pre-filter on indexed filter fields so only matching chunks are traversed
+            filters = []
+            if language:
+                filters.append({"language_detected": language})
+            if file_name:
+                filters.append({"file_name": file_name})
+            if min_created_at:
+                filters.append({"created_at": {"$gte": min_created_at}})
+            if filters:
+                vector_search["filter"] = filters[0] if len(filters) == 1 else {"$and": filters}
             
             # Vector search pipeline
             pipeline = [
                 {
-                    "$vectorSearch": {
-                        "index": "vector_index",
-                        "path": "embedding",
-                        "queryVector": query_embedding,
-                        "numCandidates": limit * 20,  # More candidates for better results
-                        "limit": limit
-                    }
+                    "$vectorSearch": vector_search
                 },
                 {
+                    # Exactly the result shape we return, with the same defaults for missing
+                    # fields: never ship the embedding vector or _id back
                     "$project": {
+                        "_id": 0,
                         "file_name": 1,
                         "text": 1,
-                        "language_detected": 1,
-                        "chunk_index": 1,
-                        "total_chunks": 1,
-                        "created_at": 1,
-                        "score": {"$meta": "vectorSearchScore"}
+                        "language_detected": {"$ifNull": ["$language_detected", "unknown"]},
+                        "chunk_index": {"$ifNull": ["$chunk_index", 0]},
+                        "total_chunks": {"$ifNull": ["$total_chunks", 1]},
+                        "similarity_score": {"$meta": "vectorSearchScore"},
+                        "created_at": 1
                     }
                 },
                 {
+                    # $vectorSearch already returns results by descending score, no $sort needed
                     "$match": {
-                        "score": {"$gte": similarity_threshold}
+                        "similarity_score": {"$gte": similarity_threshold}
                     }
-                },
-                {
-                    "$sort": {"score": -1}
                 }
             ]
             
-            results = []
-            async for doc in self.collection.aggregate(pipeline):
-                result = {
-                    "file_name": doc["file_name"],
-                    "text": doc["text"],
-                    "language_detected": doc.get("language_detected", "unknown"),
-                    "chunk_index": doc.get("chunk_index", 0),
-                    "total_chunks": doc.get("total_chunks", 1),
-                    "similarity_score": doc["score"],
-                    "created_at": doc["created_at"]
-                }
-                results.append(result)
+            # All results fit in the first batch, no getMore round trip
+            cursor = self.collection.aggregate(pipeline, batchSize=limit)
+            results = await cursor.to_list(length=limit)
             
             logger.info(f"Retrieved {len(results)} relevant documents")
-            return results
+            
+            # Empty results are not cached: a query made before ingestion must find the new chunks
+            if results and generation is not None and generation == _cached_generation:
+                if result_cache is None:
+                    result_cache = _result_caches[cache_key] = _ResultCache(len(query_embedding))
+                result_cache.add(query_embedding, results)
+            
+            return list(results)
             
         except Exception as e:
             logger.error(f"Failed to retrieve documents: {e}")
             return []
     
+    def _format_context(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Format retrieved documents into the RAG context and its source metadata"""
+        logger.info(f"Found {len(documents)} documents for context formatting")
+        
+        if not documents:
+            logger.warning("No documents found for RAG context")
+            return {
+                "context": "",
+                "sources": [],
+                "total_documents": 0,
+                "languages_detected": []
+            }
+        
+        # Format context - NO TRUNCATION, include all documents fully, built in one join
+        formatted_context = "".join(
+            f"=== Document {i+1} from {doc['file_name']} "
+            f"[Chunk {doc.get('chunk_index', 0)+1}/{doc.get('total_chunks', 1)}] ===\n"
+            f"{doc['text'].strip()}\n\n"
+            for i, doc in enumerate(documents)
+        ).strip()
+        
+        # Metadata for each document
+        sources = [
+            {
+                "file_name": doc["file_name"],
+                "chunk_index": doc.get("chunk_index", 0),
+                "similarity_score": round(doc["similarity_score"], 4),
+                "language": doc["language_detected"]
+            }
+            for doc in documents
+        ]
+        languages = {doc["language_detected"] for doc in documents}
+        
+        logger.info(f"Formatted context: {len(formatted_context)} characters from {len(sources)} sources")
+        
+        result = {
+            "context": formatted_context,
+            "sources": sources,
+            "total_documents": len(sources),
+            "languages_detected": list(languages),
+            "context_length": len(formatted_context)
+        }
+        
+        # Debug logging - FIXED syntax error
+        if formatted_context:
+            logger.info(f"Context preview: {formatted_context[:200]}...")
+            source_list = [f"{s['file_name']} chunk {s['chunk_index']}" for s in sources]
+            logger.info(f"Sources: {source_list}")
+        else:
+            logger.warning("Formatted context is empty!")
+        
+        return result
+
     async def retrieve_context_for_rag(
         self, 
         query_text: str, 
-        max_context_length: int = 25000  # Increased to accommodate full documents
+        max_context_length: int = 25000,  # Increased to accommodate full documents
+        query_embedding: Optional[List[float]] = None
     ) -> Dict[str, Any]:
         """
         Retrieve and format context for RAG (Retrieval Augmented Generation).
@@ -98,6 +311,7 @@ class EmbeddingRetriever:
         Args:
             query_text: The user's query
             max_context_length: Maximum length of combined context (increased)
+            query_embedding: Precomputed embedding of query_text, created when not given
             
         Returns:
             Dictionary containing formatted context and metadata
@@ -107,80 +321,66 @@ class EmbeddingRetriever:
             documents = await self.retrieve_similar_documents(
                 query_text=query_text,
                 limit=5,  # Reduced from 10 to 5
-                similarity_threshold=0.4
+                similarity_threshold=0.4,
+                query_embedding=query_embedding
             )
             
-            logger.info(f"Found {len(documents)} documents for context formatting")
+            return self._format_context(documents)
             
-            if not documents:
-                logger.warning("No documents found for RAG context")
-                return {
-                    "context": "",
-                    "sources": [],
-                    "total_documents": 0,
-                    "languages_detected": []
-                }
-            
-            # Format context - NO TRUNCATION, include all documents fully
-            context_parts = []
-            sources = []
-            languages = set()
-            
-            for i, doc in enumerate(documents):
-                # Collect metadata for each document
-                source_info = {
-                    "file_name": doc["file_name"],
-                    "chunk_index": doc.get("chunk_index", 0),
-                    "similarity_score": round(doc["similarity_score"], 4),
-                    "language": doc["language_detected"]
-                }
-                
-                # Add document info with clear formatting
-                doc_text = doc["text"].strip()
-                chunk_info = f"[Chunk {doc.get('chunk_index', 0)+1}/{doc.get('total_chunks', 1)}]"
-                
-                # Create well-formatted document entry - FULL CONTENT, NO TRUNCATION
-                doc_info = f"=== Document {i+1} from {doc['file_name']} {chunk_info} ===\n{doc_text}\n\n"
-                
-                # Add full document (no length checking, no truncation)
-                context_parts.append(doc_info)
-                sources.append(source_info)
-                languages.add(doc["language_detected"])
-                
-                logger.info(f"Added full document {i+1} ({len(doc_text)} chars), total sources: {len(sources)}")
-            
-            # Combine context
-            formatted_context = "".join(context_parts).strip()
-            
-            logger.info(f"Formatted context: {len(formatted_context)} characters from {len(sources)} sources")
-            
-            result = {
-                "context": formatted_context,
-                "sources": sources,
-                "total_documents": len(sources),
-                "languages_detected": list(languages),
-                "context_length": len(formatted_context)
+        except Exception as e:
+            logger.error(f"Failed to retrieve context for RAG: {e}")
+            return {
+                "context": "",
+                "sources": [],
+                "total_documents": 0,
+                "languages_detected": [],
+                "error": str(e)
             }
+    
+    async def retrieve_context_and_docs(
+        self,
+        query_text: str,
+        max_context_length: int = 25000,
+        limit: int = 5,
+        similarity_threshold: float = 0.4,
+        query_embedding: Optional[List[float]] = None
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Retrieve the RAG context together with the raw documents it was built from,
+        embedding the query and running the vector search only once.
+        
+        Args:
+            query_text: The user's query
+            max_context_length: Maximum length of combined context
+            limit: Maximum number of documents to retrieve
+            similarity_threshold: Minimum similarity score threshold
+            query_embedding: Precomputed embedding of query_text, created when not given
             
-            # Debug logging - FIXED syntax error
-            if formatted_context:
-                logger.info(f"Context preview: {formatted_context[:200]}...")
-                source_list = [f"{s['file_name']} chunk {s['chunk_index']}" for s in sources]
-                logger.info(f"Sources: {source_list}")
-            else:
-                logger.warning("Formatted context is empty!")
+        Returns:
+            Tuple of (formatted context dictionary, raw documents)
+        """
+        try:
+            if query_embedding is None:
+                query_embedding = await self.embedding_creator.create_query_embedding(query_text)
             
-            return result
+            documents = await self.retrieve_similar_documents(
+                query_text=query_text,
+                limit=limit,
+                similarity_threshold=similarity_threshold,
+                query_embedding=query_embedding
+            )
+            
+            return self._format_context(documents), documents
             
         except Exception as e:
-            logger.error(f"Failed to retrieve context for RAG: {e}")
+            logger.error(f"Failed to retrieve context and documents: {e}")
             return {
                 "context": "",
                 "sources": [],
                 "total_documents": 0,
                 "languages_detected": [],
                 "error": str(e)
-            }
+            }, []
     
     async def test_retrieval(self, query_text: str) -> Dict[str, Any]:
         """
@@ -195,17 +395,15 @@ class EmbeddingRetriever:
         try:
             logger.info(f"Testing retrieval for query: {query_text}")
             
-            # Get RAG context
-            rag_result = await self.retrieve_context_for_rag(query_text)
-            
-            # Get raw documents for comparison
-            raw_documents = await self.retrieve_similar_documents(query_text, limit=5)
+            # One search at the RAG threshold serves both: the raw documents are the ones
+            # that also pass the default threshold of retrieve_similar_documents
+            rag_result, documents = await self.retrieve_context_and_docs(query_text, limit=5)
+            raw_documents = [doc for doc in documents if doc["similarity_score"] >= 0.5]
             
             return {
                 "query": query_text,
                 "rag_context": rag_result,
                 "raw_documents_count": len(raw_documents),
-                "raw_documents": raw_documents[:3],  # First 3 for preview
                 "test_status": "success"
             }
             
@@ -5,13 +5,13 @@ import shutil
 from typing import Optional
 from fastapi import HTTPException
 from com.mhire.app.common.network_responses import HTTPCode
-from com.mhire.app.config.config import Config
+from com.mhire.app.config.config import get_config
 
 class DocumentConverter:
     """Factory class for document conversion operations"""
     
     def __init__(self):
-        self.config = Config()
+        self.config = get_config()
     
     def convert_to_pdf(self, file_path: str) -> str:
         """
@@ -67,9 +67,12 @@ class DocumentConverter:
                 temp_input = os.path.join(temp_dir, "input" + os.path.splitext(input_path)[1])
                 shutil.copy2(input_path, temp_input)
                 
-                # Run LibreOffice conversion
+                # Run LibreOffice conversion with its own profile directory: instances sharing
+                # the default profile exit without converting when files are processed concurrently
                 cmd = [
-                    'libreoffice', '--headless', '--convert-to', 'pdf',
+                    'libreoffice', '--headless',
+                    f'-env:UserInstallation=file://{os.path.join(temp_dir, "profile")}',
+                    '--convert-to', 'pdf',
                     '--outdir', temp_dir, temp_input
                 ]
                 
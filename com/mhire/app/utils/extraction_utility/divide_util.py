@@ -1,20 +1,31 @@
+import io
 import os
 import tempfile
-from typing import List, Dict, Any, Tuple
-from PyPDF2 import PdfWriter, PdfReader
-from com.mhire.app.config.config import Config
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple, Union
+import pikepdf
+from com.mhire.app.config.config import get_config
+
+# Chunks up to this size are kept in memory and sent to Document AI as bytes, larger ones go to disk
+MAX_IN_MEMORY_CHUNK_SIZE = 16 * 1024 * 1024
+
+@lru_cache(maxsize=256)
+def _pdf_page_count(file_path: str, mtime_ns: int, size: int) -> int:
+    """Page count of a PDF, memoized per file version (modification time and size)"""
+    with pikepdf.open(file_path) as pdf:
+        return len(pdf.pages)
 
 class DocumentDivider:
     """Factory class for document division operations"""
     
     def __init__(self, page_limit: int = 25):
-        self.config = Config()
+        self.config = get_config()
         self.page_limit = page_limit
     
-    def check_and_divide_file(self, file_path: str) -> List[str]:
+    def check_and_divide_file(self, file_path: str) -> List[Union[str, bytes]]:
         """
         Check if the file needs to be divided based on page count
-        Returns list with the original file path or paths to divided chunks
+        Returns list with the original file path or the divided chunks (see divide_pdf_into_chunks)
         """
         
         print(f"File processing: {os.path.basename(file_path)}")
@@ -40,10 +51,12 @@ class DocumentDivider:
     def get_file_info(self, file_path: str) -> Dict[str, Any]:
         """Get basic information about a file"""
         
-        if not os.path.exists(file_path):
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
             return None
         
-        file_size = os.path.getsize(file_path)
+        file_size = stat.st_size
         file_extension = os.path.splitext(file_path)[1].lower()
         
         info = {
@@ -56,49 +69,49 @@ class DocumentDivider:
         # Add PDF-specific info
         if file_extension == '.pdf':
             try:
-                with open(file_path, 'rb') as file:
-                    pdf_reader = PdfReader(file)
-                    info['pages'] = len(pdf_reader.pages)
+                info['pages'] = _pdf_page_count(file_path, stat.st_mtime_ns, file_size)
             except Exception as e:
                 print(f"Error reading PDF: {str(e)}")
                 info['pages'] = 'Unknown'
         
         return info
         
-    def divide_pdf_into_chunks(self, file_path: str, page_count: int) -> List[str]:
-        """Divide a PDF into chunks based on page limit"""
+    def divide_pdf_into_chunks(self, file_path: str, page_count: int) -> List[Union[str, bytes]]:
+        """
+        Divide a PDF into chunks based on page limit.
+        Each chunk is returned as its PDF bytes, or as the path of a temporary file when it
+        exceeds MAX_IN_MEMORY_CHUNK_SIZE
+        """
         
         chunk_files = []
-        base_name = os.path.splitext(os.path.basename(file_path))[0]
         
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PdfReader(file)
-                
+            # QPDF copies the page objects natively, content and image streams are not re-encoded
+            with pikepdf.open(file_path) as source_pdf:
                 # Calculate number of chunks needed
                 num_chunks = (page_count + self.page_limit - 1) // self.page_limit
                 print(f"Dividing PDF into {num_chunks} chunks")
                 
                 for chunk_idx in range(num_chunks):
-                    # Create a temporary file for this chunk
-                    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f"_chunk{chunk_idx+1}.pdf")
-                    chunk_path = temp_file.name
-                    temp_file.close()
-                    
-                    # Create PDF writer for this chunk
-                    pdf_writer = PdfWriter()
-                    
                     # Calculate page range for this chunk
                     start_page = chunk_idx * self.page_limit
                     end_page = min((chunk_idx + 1) * self.page_limit, page_count)
                     
-                    # Add pages to this chunk
-                    for page_idx in range(start_page, end_page):
-                        pdf_writer.add_page(pdf_reader.pages[page_idx])
+                    # Copy the page range into a new PDF and write it to memory
+                    buffer = io.BytesIO()
+                    with pikepdf.Pdf.new() as chunk_pdf:
+                        chunk_pdf.pages.extend(source_pdf.pages[start_page:end_page])
+                        chunk_pdf.save(buffer)
+                    
+                    if buffer.tell() <= MAX_IN_MEMORY_CHUNK_SIZE:
+                        print(f"Created chunk {chunk_idx+1}/{num_chunks} in memory ({buffer.tell()} bytes) with pages {start_page+1}-{end_page}")
+                        chunk_files.append(buffer.getvalue())
+                        continue
                     
-                    # Write chunk to file
-                    with open(chunk_path, 'wb') as chunk_file:
-                        pdf_writer.write(chunk_file)
+                    # Too large to keep around: move it to a temporary file for this chunk
+                    with tempfile.NamedTemporaryFile(delete=False, suffix=f"_chunk{chunk_idx+1}.pdf") as temp_file:
+                        temp_file.write(buffer.getbuffer())
+                        chunk_path = temp_file.name
                     
                     print(f"Created chunk {chunk_idx+1}/{num_chunks}: {os.path.basename(chunk_path)} with pages {start_page+1}-{end_page}")
                     chunk_files.append(chunk_path)
@@ -108,4 +121,4 @@ class DocumentDivider:
         except Exception as e:
             print(f"Error dividing PDF: {str(e)}")
             # If division fails, return the original file
-            return [file_path]
\ No newline at end of file
+            return [file_path]
@@ -1,15 +1,52 @@
 import os
+import re
+import threading
 import mimetypes
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+import pypdfium2 as pdfium
 from fastapi import HTTPException
 from com.mhire.app.common.network_responses import HTTPCode
-from com.mhire.app.utils.gcp_utility.gcp_util import GCPUtil
+from com.mhire.app.utils.gcp_utility.gcp_util import get_gcp_util
+
+# MIME types of the formats we handle, looked up before the system mimetypes database
+_MIME_MAP = {
+    '.pdf': 'application/pdf',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.tiff': 'image/tiff',
+    '.tif': 'image/tiff',
+    '.bmp': 'image/bmp',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.txt': 'text/plain',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.doc': 'application/msword',
+    '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    '.ppt': 'application/vnd.ms-powerpoint',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.xls': 'application/vnd.ms-excel'
+}
+
+# A PDF's own text layer is used instead of Document AI when it averages at least this many
+# characters per page; fewer means scanned pages that need OCR
+MIN_NATIVE_CHARS_PER_PAGE = 100
+
+# PDF text layers store Bengali glyphs in visual order (pre-base vowel signs before their
+# consonant), so Bengali documents always go through Document AI
+_BENGALI_RE = re.compile(r'[\u0980-\u09FF]')
+
+# PDFium is not thread-safe and chunks are extracted from several threads
+_pdfium_lock = threading.Lock()
+
+# Load the system MIME database at import instead of on the first unknown extension
+mimetypes.init()
 
 class TextExtractor:
     """Factory class for text extraction operations using Google Document AI via GCP Util"""
     
     def __init__(self):
-        self.gcp_util = GCPUtil()
+        self.gcp_util = get_gcp_util()
     
     def process_document(self, file_path: str, mime_type: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -35,17 +72,11 @@ class TextExtractor:
             with open(file_path, "rb") as file:
                 file_content = file.read()
             
-            print(f"    File size: {len(file_content)} bytes")
-            print(f"    Sending request to Document AI...")
-            
-            # Use GCP Util to process the document
-            result = self.gcp_util.process_document(file_content, mime_type)
+            result = self.process_content(file_content, mime_type)
             
             if result['success']:
-                print(f"    Document AI processing completed")
                 # Add file-specific metadata
                 result['metadata']['file_path'] = file_path
-                result['metadata']['file_size'] = len(file_content)
             
             return result
             
@@ -58,19 +89,87 @@ class TextExtractor:
                 'metadata': {'file_path': file_path}
             }
     
+    def process_content(self, file_content: bytes, mime_type: str) -> Dict[str, Any]:
+        """
+        Extract text from document bytes already in memory: born-digital PDFs from their
+        own text layer, everything else using Google Document AI
+        """
+        print(f"    File size: {len(file_content)} bytes")
+        
+        if mime_type == 'application/pdf':
+            native_text = self._extract_native_pdf_text(file_content)
+            if native_text is not None:
+                text, page_count = native_text
+                print(f"    Extracted text from the PDF text layer: {len(text)} characters")
+                return {
+                    'success': True,
+                    'text': text,
+                    'error': None,
+                    'metadata': {
+                        'mime_type': mime_type,
+                        'extraction_method': 'native_text',
+                        'text_length': len(text),
+                        'page_count': page_count,
+                        'file_size': len(file_content)
+                    }
+                }
+        
+        print(f"    Sending request to Document AI...")
+        
+        # Use GCP Util to process the document
+        result = self.gcp_util.process_document(file_content, mime_type)
+        
+        if result['success']:
+            print(f"    Document AI processing completed")
+            result['metadata']['file_size'] = len(file_content)
+        
+        return result
+    
+    def _extract_native_pdf_text(self, file_content: bytes) -> Optional[Tuple[str, int]]:
+        """
+        Text and page count of a born-digital PDF read locally with pdfium, or None when the
+        PDF needs Document AI (scanned pages, Bengali text or an unreadable file)
+        """
+        try:
+            with _pdfium_lock:
+                pdf = pdfium.PdfDocument(file_content)
+                try:
+                    page_count = len(pdf)
+                    page_texts = []
+                    for page in pdf:
+                        text_page = page.get_textpage()
+                        page_texts.append(text_page.get_text_range())
+                        text_page.close()
+                        page.close()
+                finally:
+                    pdf.close()
+        except Exception as e:
+            print(f"    Could not read PDF text layer: {str(e)}")
+            return None
+        
+        text = '\n'.join(page_texts)
+        if not page_count or len(text.strip()) < MIN_NATIVE_CHARS_PER_PAGE * page_count:
+            return None
+        if '\ufffd' in text or _BENGALI_RE.search(text):
+            return None
+        
+        return text, page_count
+    
     def _process_text_file_directly(self, file_path: str) -> Dict[str, Any]:
         """Process text files directly without Document AI"""
         try:
             print(f"    Reading text file directly: {os.path.basename(file_path)}")
             
-            # Read text file with multiple encoding attempts
+            # Read the file once, then try the encodings on the bytes in memory
+            with open(file_path, 'rb') as f:
+                raw_content = f.read()
+            
             encodings = ['utf-8', 'utf-16', 'latin-1', 'cp1252', 'ascii']
             text_content = None
             
             for encoding in encodings:
                 try:
-                    with open(file_path, 'r', encoding=encoding) as f:
-                        text_content = f.read()
+                    text_content = raw_content.decode(encoding)
                     print(f"    Successfully read with {encoding} encoding")
                     break
                 except UnicodeDecodeError:
@@ -79,10 +178,13 @@ class TextExtractor:
             if text_content is None:
                 raise Exception("Could not read text file with any supported encoding")
             
+            # Same newlines as reading in text mode
+            text_content = text_content.replace('\r\n', '\n').replace('\r', '\n')
+            
             if not text_content.strip():
                 raise Exception("Text file is empty")
             
-            file_size = os.path.getsize(file_path)
+            file_size = len(raw_content)
             
             return {
                 'success': True,
@@ -108,29 +210,8 @@ class TextExtractor:
     
     def get_mime_type(self, file_path: str) -> str:
         """Get MIME type for file"""
-        mime_type, _ = mimetypes.guess_type(file_path)
-        if mime_type is None:
-            extension = os.path.splitext(file_path)[1].lower()
-            mime_map = {
-                '.pdf': 'application/pdf',
-                '.jpg': 'image/jpeg',
-                '.jpeg': 'image/jpeg',
-                '.png': 'image/png',
-                '.tiff': 'image/tiff',
-                '.tif': 'image/tiff',
-                '.bmp': 'image/bmp',
-                '.gif': 'image/gif',
-                '.webp': 'image/webp',
-                '.txt': 'text/plain',
-                '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                '.doc': 'application/msword',
-                '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
-                '.ppt': 'application/vnd.ms-powerpoint',
-                '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                '.xls': 'application/vnd.ms-excel'
-            }
-            mime_type = mime_map.get(extension, 'application/pdf')
-        return mime_type
+        extension = os.path.splitext(file_path)[1].lower()
+        return _MIME_MAP.get(extension) or mimetypes.guess_type(file_path)[0] or 'application/pdf'
     
     def validate_document_ai_setup(self) -> Dict[str, Any]:
         """Validate Document AI configuration and connectivity via GCP Util"""
@@ -1,16 +1,39 @@
 import os
+from functools import lru_cache
 from typing import Optional, Dict, Any
+from google.api_core import exceptions as gcp_exceptions
 from google.api_core.client_options import ClientOptions
+from google.api_core.retry import Retry, if_exception_type
 from google.cloud import documentai
-from com.mhire.app.config.config import Config
+from com.mhire.app.config.config import get_config
+
+# Concurrent chunk requests can exceed the Document AI quota: back off exponentially and retry
+PROCESS_RETRY = Retry(
+    predicate=if_exception_type(gcp_exceptions.ResourceExhausted, gcp_exceptions.ServiceUnavailable),
+    initial=1.0,
+    maximum=30.0,
+    multiplier=2.0,
+    timeout=300.0
+)
 
 class GCPUtil:
     
     def __init__(self):
-        self.config = Config()
+        self.config = get_config()
         self.client = None
+        self.processor_name = None
         self._setup_credentials()
         self._initialize_client()
+        
+        # Same for every request, built once
+        self.process_options = documentai.ProcessOptions(
+            layout_config=documentai.ProcessOptions.LayoutConfig(
+                chunking_config=documentai.ProcessOptions.LayoutConfig.ChunkingConfig(
+                    chunk_size=1000,
+                    include_ancestor_headings=True,
+                )
+            )
+        )
     
     def _setup_credentials(self):
         """Setup Google Cloud credentials with proper path handling"""
@@ -51,6 +74,12 @@ class GCPUtil:
                     api_endpoint=f"{self.config.location}-documentai.googleapis.com"
                 )
             )
+            self.processor_name = self.client.processor_version_path(
+                self.config.project_id,
+                self.config.location,
+                self.config.processor_id,
+                self.config.processor_version
+            )
             print("Document AI client initialized successfully")
         except Exception as e:
             print(f"Error initializing Document AI client: {e}")
@@ -68,89 +97,61 @@ class GCPUtil:
             }
 
         try:
-            print(f"    Building processor path with project_id={self.config.project_id}, location={self.config.location}, processor_id={self.config.processor_id}, processor_version={self.config.processor_version}")
-            
-            # Get processor path
-            name = self.client.processor_version_path(
-                self.config.project_id,
-                self.config.location,
-                self.config.processor_id,
-                self.config.processor_version
-            )
-            print(f"    Processor path: {name}")
-
-            # Configure process options for layout analysis
-            process_options = documentai.ProcessOptions(
-                layout_config=documentai.ProcessOptions.LayoutConfig(
-                    chunking_config=documentai.ProcessOptions.LayoutConfig.ChunkingConfig(
-                        chunk_size=1000,
-                        include_ancestor_headings=True,
-                    )
-                )
-            )
+            print(f"    Processor path: {self.processor_name}")
 
             # Process document
             request = documentai.ProcessRequest(
-                name=name,
+                name=self.processor_name,
                 raw_document=documentai.RawDocument(content=content, mime_type=mime_type),
-                process_options=process_options,
+                process_options=self.process_options,
             )
 
             print(f"    Sending request to Document AI...")
-            result = self.client.process_document(request=request)
+            result = self.client.process_document(request=request, retry=PROCESS_RETRY)
             document = result.document
             print(f"    Document AI response received")
 
-            # Extract text using multiple methods
+            # Extract text using multiple methods. Protobuf fields always exist (empty when unset),
+            # and the text is read from the message once
+            document_text = document.text
+            pages = document.pages
             extracted_text = ''
             extraction_method = 'none'
 
             # Method 1: Direct text
-            if document.text and document.text.strip():
-                extracted_text = document.text
+            if document_text and document_text.strip():
+                extracted_text = document_text
                 extraction_method = 'direct_text'
                 print(f"    Extracted text using direct_text method: {len(extracted_text)} characters")
 
             # Method 2: From chunks
-            elif hasattr(document, 'chunked_document') and document.chunked_document:
-                if document.chunked_document.chunks:
-                    chunk_text = []
-                    for chunk in document.chunked_document.chunks:
-                        if hasattr(chunk, 'content'):
-                            chunk_text.append(chunk.content)
-                    if chunk_text:
-                        extracted_text = '\n'.join(chunk_text)
-                        extraction_method = 'chunked_text'
-                        print(f"    Extracted text using chunked_text method: {len(extracted_text)} characters")
+            elif document.chunked_document.chunks:
+                chunk_text = [chunk.content for chunk in document.chunked_document.chunks]
+                extracted_text = '\n'.join(chunk_text)
+                extraction_method = 'chunked_text'
+                print(f"    Extracted text using chunked_text method: {len(extracted_text)} characters")
 
             # Method 3: From layout blocks
-            elif hasattr(document, 'document_layout') and document.document_layout:
-                if document.document_layout.blocks:
-                    block_text = []
-                    for block in document.document_layout.blocks:
-                        if hasattr(block, 'text_block') and block.text_block:
-                            if hasattr(block.text_block, 'text'):
-                                block_text.append(block.text_block.text)
-                    if block_text:
-                        extracted_text = '\n'.join(block_text)
-                        extraction_method = 'layout_blocks'
-                        print(f"    Extracted text using layout_blocks method: {len(extracted_text)} characters")
+            elif document.document_layout.blocks:
+                # text_block is one member of the block oneof, `in` checks which one is set
+                block_text = [
+                    block.text_block.text
+                    for block in document.document_layout.blocks
+                    if "text_block" in block
+                ]
+                if block_text:
+                    extracted_text = '\n'.join(block_text)
+                    extraction_method = 'layout_blocks'
+                    print(f"    Extracted text using layout_blocks method: {len(extracted_text)} characters")
 
             # Method 4: From pages and paragraphs
-            if not extracted_text and hasattr(document, 'pages') and document.pages:
-                page_text = []
-                for page in document.pages:
-                    if hasattr(page, 'paragraphs') and page.paragraphs:
-                        for paragraph in page.paragraphs:
-                            if hasattr(paragraph, 'layout') and paragraph.layout:
-                                if hasattr(paragraph.layout, 'text_anchor') and paragraph.layout.text_anchor:
-                                    if hasattr(paragraph.layout.text_anchor, 'text_segments'):
-                                        for segment in paragraph.layout.text_anchor.text_segments:
-                                            if hasattr(segment, 'start_index') and hasattr(segment, 'end_index'):
-                                                start = segment.start_index
-                                                end = segment.end_index
-                                                if document.text:
-                                                    page_text.append(document.text[start:end])
+            if not extracted_text and document_text and pages:
+                page_text = [
+                    document_text[segment.start_index:segment.end_index]
+                    for page in pages
+                    for paragraph in page.paragraphs
+                    for segment in paragraph.layout.text_anchor.text_segments
+                ]
                 if page_text:
                     extracted_text = '\n'.join(page_text)
                     extraction_method = 'page_paragraphs'
@@ -158,11 +159,11 @@ class GCPUtil:
 
             if not extracted_text:
                 print(f"    WARNING: No text could be extracted from document")
-                print(f"    Document has text: {bool(document.text)}")
-                print(f"    Document text length: {len(document.text) if document.text else 0}")
-                print(f"    Document has pages: {bool(hasattr(document, 'pages') and document.pages)}")
-                if hasattr(document, 'pages') and document.pages:
-                    print(f"    Number of pages: {len(document.pages)}")
+                print(f"    Document has text: {bool(document_text)}")
+                print(f"    Document text length: {len(document_text)}")
+                print(f"    Document has pages: {bool(pages)}")
+                if pages:
+                    print(f"    Number of pages: {len(pages)}")
 
             # Prepare metadata
             metadata = {
@@ -172,8 +173,8 @@ class GCPUtil:
             }
 
             # Add document-specific metadata
-            if hasattr(document, 'pages') and document.pages:
-                metadata['page_count'] = len(document.pages)
+            if pages:
+                metadata['page_count'] = len(pages)
 
             success = bool(extracted_text and extracted_text.strip())
             
@@ -223,3 +224,8 @@ class GCPUtil:
             validation['issues'].append("Document AI client not initialized")
 
         return validation
+
+@lru_cache(maxsize=1)
+def get_gcp_util() -> GCPUtil:
+    """Set up the credentials and the Document AI client (gRPC channel) once per process"""
+    return GCPUtil()
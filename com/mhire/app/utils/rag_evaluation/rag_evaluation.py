@@ -1,75 +1,163 @@
+import asyncio
+import hashlib
 import logging
 import re
+import threading
+import uuid
+from datetime import datetime, timedelta
+import httpx
 import openai
-from typing import Dict, List, Any, Optional
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import orjson
+from cachetools import LRUCache
+from typing import Dict, List, Any, Optional, Tuple
+from sklearn.feature_extraction.text import HashingVectorizer
 import numpy as np
+from pymongo import UpdateOne
 
-from com.mhire.app.config.config import Config
+from com.mhire.app.config.config import get_config
+from com.mhire.app.database.db_connection.db_connection import get_db
 
 logger = logging.getLogger(__name__)
 
+# Keywords: runs of Bengali-block characters (vowel signs included) or of Latin letters
+_TOKEN_RE = re.compile(r'[\u0980-\u09FF]+|[a-zA-Z]+')
+
+# Parse the evaluator's "স্কোর: ..." (score) and "বিশ্লেষণ: ..." (analysis) lines: both in one pass
+# when the answer follows the requested format, each on its own otherwise
+_GROUNDEDNESS_RE = re.compile(r'স্কোর:\s*(?P<score>[0-9.]+).*?বিশ্লেষণ:\s*(?P<analysis>.+)', re.DOTALL)
+_SCORE_RE = re.compile(r'স্কোর:\s*([0-9.]+)')
+_ANALYSIS_RE = re.compile(r'বিশ্লেষণ:\s*(.+)', re.DOTALL)
+
+# An answer whose keywords nearly all appear in the context is judged grounded without the
+# judge model; short answers always go to the judge, their overlap says little
+LEXICAL_GROUNDED_OVERLAP = 0.9
+LEXICAL_MIN_TOKENS = 5
+
+# Output budget of a groundedness judgment: the score comes first, then a short analysis
+JUDGE_MAX_TOKENS = 128
+
+# Stateless term-frequency vectors with unit L2 norm (so a dot product is the cosine similarity),
+# over the same Bengali/Latin keywords as the overlap check. No vocabulary is fitted per call,
+# and IDF over a handful of retrieved documents would carry little signal anyway
+_VECTORIZER = HashingVectorizer(
+    n_features=2**18,
+    alternate_sign=False,
+    norm='l2',
+    token_pattern=_TOKEN_RE.pattern,
+    dtype=np.float32
+)
+
+# Weights of the mean term similarity, the relevance ratio and the mean vector search score
+RELEVANCE_WEIGHTS = np.array([0.3, 0.4, 0.3])
+
+# Preprocessed texts kept by sha256 digest, enough for the query and
+# retrieved documents of one evaluation (its documents recur when retrieval and evaluation overlap)
+TEXT_CACHE_SIZE = 64
+
+def _text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+# Shared by every evaluator; relevance is scored in worker threads, so access goes through the lock
+_preprocessed_texts: LRUCache = LRUCache(maxsize=TEXT_CACHE_SIZE)
+_preprocessed_texts_lock = threading.Lock()
+
+# Groundedness judgments kept by (judge model, answer, context), reused while the judge is deterministic
+GROUNDEDNESS_CACHE_SIZE = 1024
+
+# Groundedness completions in flight per evaluator, to stay under the account rate limits
+MAX_CONCURRENT_EVALUATIONS = 8
+
+# Attempts per completion; the client backs off exponentially (honouring Retry-After) on 429/5xx
+MAX_EVALUATION_ATTEMPTS = 5
+
+# Batch states after which the job will not change anymore
+BATCH_TERMINAL_STATES = ("completed", "failed", "expired", "cancelled")
+
+# Deferred groundedness judgments: queued by evaluation_id as "pending", filled in as "done" by a flush
+GROUNDEDNESS_RESULTS_COLLECTION = "groundedness_results"
+
+# Pending judgments scored per flush (one Batch API job when use_batch_api is set)
+GROUNDEDNESS_FLUSH_LIMIT = 1000
+
+# Judgments claimed by a flush but neither stored nor submitted after this long are queued again
+# (the flush was killed)
+GROUNDEDNESS_CLAIM_TIMEOUT = timedelta(minutes=30)
+
+def warm_up():
+    """
+    Run the evaluation kernels once (sparse hashing, sparse and dense products) so their lazy
+    initialization happens in the preloaded master process rather than on a worker's first request
+    """
+    vectors = _VECTORIZER.transform(["warm up বাংলা", "warm up"])
+    _ = (vectors[1:] @ vectors[0].T).toarray()
+    _ = np.zeros((16, 16), dtype=np.float32) @ np.zeros((16, 16), dtype=np.float32)
+
 class RAGEvaluator:
     def __init__(self):
-        self.config = Config()
+        self.config = get_config()
+        # Pooled HTTP/2 client sized for the concurrent judge calls, multiplexed over few connections
+        self._http = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=128, max_keepalive_connections=64),
+            timeout=httpx.Timeout(120.0, connect=5.0)
+        )
         self.openai_client = openai.AsyncOpenAI(
-            api_key=self.config.openai_api_key
+            api_key=self.config.openai_api_key,
+            max_retries=MAX_EVALUATION_ATTEMPTS - 1,
+            http_client=self._http
         )
-        # Use the model from your config (GPT-4.1)
-        self.model = self.config.openai_model or "gpt-3.5-turbo"  # Fallback only if not set
-        logger.info(f"RAG Evaluator initialized with model: {self.model}")
-        
-    def preprocess_text(self, text: str) -> str:
-        """Clean and preprocess text for evaluation"""
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        # Convert to lowercase for comparison
-        text = text.lower().strip()
-        return text
-    
-    def calculate_cosine_similarity(self, text1: str, text2: str) -> float:
-        """Calculate cosine similarity between two texts using TF-IDF"""
-        try:
-            # Preprocess texts
-            text1 = self.preprocess_text(text1)
-            text2 = self.preprocess_text(text2)
-            
-            if not text1 or not text2:
-                return 0.0
-            
-            # Create TF-IDF vectors
-            vectorizer = TfidfVectorizer(stop_words=None)  # Keep all words for Bengali support
-            tfidf_matrix = vectorizer.fit_transform([text1, text2])
-            
-            # Calculate cosine similarity
-            similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-            
-            return float(similarity)
-            
-        except Exception as e:
-            logger.error(f"Error calculating cosine similarity: {e}")
-            return 0.0
+        self._evaluation_sem = asyncio.Semaphore(MAX_CONCURRENT_EVALUATIONS)
+        # Short rubric judgments don't need the generation model: a mini model scores groundedness
+        self.judge_model = self.config.judge_model or "gpt-4.1-mini-2025-04-14"
+        self._groundedness_cache: LRUCache = LRUCache(maxsize=GROUNDEDNESS_CACHE_SIZE)
+        logger.info(f"RAG Evaluator initialized with judge model: {self.judge_model}")
+        
+    @staticmethod
+    def preprocess_text(text: str) -> str:
+        """Clean and preprocess text for evaluation (memoized by digest, the same documents recur across evaluations)"""
+        key = _text_digest(text)
+        with _preprocessed_texts_lock:
+            cleaned = _preprocessed_texts.get(key)
+        if cleaned is not None:
+            return cleaned
+        
+        # str.split() drops leading/trailing whitespace and splits on runs of it in one C pass,
+        # so the join collapses whitespace; then lowercase for comparison
+        cleaned = ' '.join(text.split()).lower()
+        with _preprocessed_texts_lock:
+            _preprocessed_texts[key] = cleaned
+        return cleaned
     
-    def check_keyword_overlap(self, query: str, document: str) -> float:
-        """Check keyword overlap between query and document for Bengali text"""
+    def calculate_query_similarities(self, query: str, documents: List[str]) -> np.ndarray:
+        """Cosine similarity of the query's term vector to each document's, as a single sparse product"""
         try:
-            # Extract keywords from query and document
-            query_words = set(re.findall(r'[\u0980-\u09FF]+|[a-zA-Z]+', query.lower()))
-            doc_words = set(re.findall(r'[\u0980-\u09FF]+|[a-zA-Z]+', document.lower()))
+            query = self.preprocess_text(query)
+            documents = [self.preprocess_text(document) for document in documents]
             
-            if not query_words:
-                return 0.0
+            if not query:
+                return np.zeros(len(documents), dtype=np.float32)
             
-            # Calculate overlap ratio
-            overlap = len(query_words.intersection(doc_words))
-            overlap_ratio = overlap / len(query_words)
+            vectors = _VECTORIZER.transform([query] + documents)
             
-            return overlap_ratio
+            # Rows are unit length, so the cosine is just the dot product;
+            # empty documents have all-zero rows and score 0
+            return (vectors[1:] @ vectors[0].T).toarray().ravel()
             
         except Exception as e:
-            logger.error(f"Error checking keyword overlap: {e}")
-            return 0.0
+            logger.error(f"Error calculating cosine similarities: {e}")
+            return np.zeros(len(documents), dtype=np.float32)
+    
+    def calculate_keyword_overlaps(self, query: str, documents: List[str]) -> np.ndarray:
+        """Keyword overlap ratio of the query with each document, tokenizing the query only once"""
+        overlaps = np.zeros(len(documents), dtype=np.float64)
+        query_words = frozenset(_TOKEN_RE.findall(query.lower()))
+        if not query_words:
+            return overlaps
+        
+        for i, document in enumerate(documents):
+            overlaps[i] = len(query_words.intersection(_TOKEN_RE.findall(document.lower()))) / len(query_words)
+        
+        return overlaps
     
     async def evaluate_groundedness(self, answer: str, context: str) -> Dict[str, Any]:
         """
@@ -77,15 +165,64 @@ class RAGEvaluator:
         Returns groundedness score and analysis
         """
         try:
-            if not context.strip():
-                return {
-                    "score": 0.0,
-                    "analysis": "No context provided",
-                    "supported": False
-                }
+            immediate = self._immediate_groundedness(answer, context)
+            if immediate is not None:
+                return immediate
+            
+            # Use the judge model to evaluate groundedness, deterministically
+            async with self._evaluation_sem:
+                response = await self.openai_client.chat.completions.create(
+                    model=self.judge_model,
+                    messages=[{"role": "user", "content": self._groundedness_prompt(answer, context)}],
+                    max_tokens=JUDGE_MAX_TOKENS,
+                    temperature=0
+                )
             
-            # Use your GPT-4.1 model to evaluate groundedness
-            prompt = f"""আপনি একটি RAG সিস্টেম মূল্যায়নকারী। নিচের উত্তরটি প্রদত্ত প্রসঙ্গ দ্বারা সমর্থিত কিনা তা মূল্যায়ন করুন।
+            result = self._parse_groundedness(response.choices[0].message.content)
+            self._groundedness_cache[self._groundedness_key(answer, context)] = result
+            return dict(result)
+            
+        except Exception as e:
+            logger.error(f"Error evaluating groundedness: {e}")
+            return {
+                "score": 0.0,
+                "analysis": f"Error in evaluation: {str(e)}",
+                "supported": False
+            }
+    
+    @staticmethod
+    def _lexical_groundedness(answer: str, context: str) -> Optional[Dict[str, Any]]:
+        """
+        Groundedness of an answer that (nearly) copies the context, from keyword overlap alone;
+        None when the judge model is needed. Low overlap is not conclusive (the answer may be
+        in another language than the context), so only the grounded side is short-circuited
+        """
+        answer_tokens = _TOKEN_RE.findall(answer.lower())
+        if len(answer_tokens) < LEXICAL_MIN_TOKENS:
+            return None
+        
+        context_tokens = set(_TOKEN_RE.findall(context.lower()))
+        overlap = sum(token in context_tokens for token in answer_tokens) / len(answer_tokens)
+        if overlap < LEXICAL_GROUNDED_OVERLAP:
+            return None
+        
+        return {
+            "score": overlap,
+            "analysis": f"Answer keywords found in the context ({overlap:.0%}), judged grounded without the judge model",
+            "supported": True
+        }
+    
+    def _groundedness_key(self, answer: str, context: str) -> str:
+        """Cache key of a groundedness judgment: digest of the judge model, answer and context"""
+        digest = hashlib.sha256()
+        for part in (self.judge_model, answer, context):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+    
+    def _groundedness_prompt(self, answer: str, context: str) -> str:
+        """Prompt asking the model to score how well the context supports the answer"""
+        return f"""আপনি একটি RAG সিস্টেম মূল্যায়নকারী। নিচের উত্তরটি প্রদত্ত প্রসঙ্গ দ্বারা সমর্থিত কিনা তা মূল্যায়ন করুন।
 
 প্রসঙ্গ:
 {context}
@@ -101,41 +238,130 @@ class RAGEvaluator:
 উত্তর ফরম্যাট:
 স্কোর: [0.0-1.0]
 বিশ্লেষণ: [সংক্ষিপ্ত ব্যাখ্যা]"""
-
-            response = await self.openai_client.chat.completions.create(
-                model=self.model,  # Use your GPT-4.1 from config
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=300,
-                temperature=0.1
-            )
-            
-            result_text = response.choices[0].message.content.strip()
-            
-            # Parse the response
-            score_match = re.search(r'স্কোর:\s*([0-9.]+)', result_text)
-            analysis_match = re.search(r'বিশ্লেষণ:\s*(.+)', result_text, re.DOTALL)
+    
+    def _parse_groundedness(self, result_text: str) -> Dict[str, Any]:
+        """Groundedness result from the model's scored analysis"""
+        result_text = result_text.strip()
+        
+        # Parse the response
+        match = _GROUNDEDNESS_RE.search(result_text)
+        if match:
+            score = float(match['score'])
+            analysis = match['analysis'].strip()
+        else:
+            score_match = _SCORE_RE.search(result_text)
+            analysis_match = _ANALYSIS_RE.search(result_text)
             
             score = float(score_match.group(1)) if score_match else 0.0
             analysis = analysis_match.group(1).strip() if analysis_match else result_text
-            
-            return {
-                "score": min(max(score, 0.0), 1.0),  # Ensure score is between 0 and 1
-                "analysis": analysis,
-                "supported": score >= 0.7
-            }
-            
-        except Exception as e:
-            logger.error(f"Error evaluating groundedness: {e}")
+        
+        return {
+            "score": min(max(score, 0.0), 1.0),  # Ensure score is between 0 and 1
+            "analysis": analysis,
+            "supported": score >= 0.7
+        }
+    
+    def _immediate_groundedness(self, answer: str, context: str) -> Optional[Dict[str, Any]]:
+        """Groundedness known without a judge call: no context, an earlier judgment or a near-verbatim answer"""
+        if not context.strip():
             return {
                 "score": 0.0,
-                "analysis": f"Error in evaluation: {str(e)}",
+                "analysis": "No context provided",
                 "supported": False
             }
+        
+        cached = self._groundedness_cache.get(self._groundedness_key(answer, context))
+        if cached is not None:
+            return dict(cached)
+        
+        return self._lexical_groundedness(answer, context)
     
-    def evaluate_relevance(self, query: str, retrieved_documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def submit_groundedness_batch(self, items: Dict[str, Tuple[str, str]]) -> str:
+        """
+        Submit the groundedness judgments of (answer, context) pairs, keyed by custom id, as one
+        OpenAI Batch API job (half the price, but it may take up to 24 hours). Returns the batch id
+        right away; the results are read later with collect_groundedness_batch
+        """
+        jsonl = b"\n".join(
+            orjson.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.judge_model,
+                    "messages": [{"role": "user", "content": self._groundedness_prompt(answer, context)}],
+                    "max_tokens": JUDGE_MAX_TOKENS,
+                    "temperature": 0
+                }
+            })
+            for custom_id, (answer, context) in items.items()
+        )
+        
+        input_file = await self.openai_client.files.create(
+            file=("groundedness.jsonl", jsonl),
+            purpose="batch"
+        )
+        batch = await self.openai_client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info(f"Submitted groundedness batch {batch.id} with {len(items)} requests")
+        
+        return batch.id
+    
+    async def collect_groundedness_batch(self, batch_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Groundedness results of a submitted batch by custom id, or None while it is still running.
+        A single status check, no polling: requests without a result (failed, or the batch
+        expired) are missing from the returned results
+        """
+        batch = await self.openai_client.batches.retrieve(batch_id)
+        if batch.status not in BATCH_TERMINAL_STATES:
+            return None
+        
+        logger.info(f"Groundedness batch {batch.id} finished with status {batch.status}")
+        if not batch.output_file_id:
+            return {}
+        
+        output = await self.openai_client.files.content(batch.output_file_id)
+        results = {}
+        for line in output.text.splitlines():
+            if not line:
+                continue
+            record = orjson.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") != 200:
+                logger.warning(f"Batch request {record['custom_id']} failed: {record.get('error')}")
+                continue
+            try:
+                results[record["custom_id"]] = self._parse_groundedness(
+                    response["body"]["choices"][0]["message"]["content"]
+                )
+            except ValueError as e:
+                logger.warning(f"Could not parse batch result {record['custom_id']}: {e}")
+        
+        return results
+    
+    async def evaluate_groundedness_many(self, items: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Evaluate the groundedness of many (answer, context) pairs concurrently, returned in the
+        same order; at most MAX_CONCURRENT_EVALUATIONS completions are in flight
+        """
+        return list(await asyncio.gather(
+            *[self.evaluate_groundedness(answer, context) for answer, context in items]
+        ))
+    
+    def evaluate_relevance(
+        self,
+        query: str,
+        retrieved_documents: List[Dict[str, Any]],
+        include_individual: bool = False
+    ) -> Dict[str, Any]:
         """
         Evaluate the relevance of retrieved documents to the query
         IMPROVED: Better handling for Bengali text and vector search scores
+        Per-document similarities are only included (as a float32 array) when include_individual is set
         """
         try:
             if not retrieved_documents:
@@ -146,47 +372,41 @@ class RAGEvaluator:
                     "total_docs": 0
                 }
             
-            query_processed = self.preprocess_text(query)
-            relevance_scores = []
-            relevant_count = 0
-            
-            for doc in retrieved_documents:
-                doc_text = self.preprocess_text(doc.get('text', ''))
-                
-                # Calculate cosine similarity
-                similarity = self.calculate_cosine_similarity(query_processed, doc_text)
-                relevance_scores.append(similarity)
-                
-                # For Bengali text, use lower threshold and also check keyword overlap
-                keyword_overlap = self.check_keyword_overlap(query, doc_text)
-                
-                # Consider relevant if similarity > 0.1 OR keyword overlap > 0.2 OR similarity_score from vector search > 0.5
-                vector_score = doc.get('similarity_score', 0.0)
-                
-                if similarity > 0.1 or keyword_overlap > 0.2 or vector_score > 0.5:
-                    relevant_count += 1
-            
-            # Calculate overall relevance score
-            avg_relevance = np.mean(relevance_scores) if relevance_scores else 0.0
-            relevance_ratio = relevant_count / len(retrieved_documents)
-            
-            # If documents were retrieved by vector search with good scores, give credit
-            avg_vector_score = np.mean([doc.get('similarity_score', 0.0) for doc in retrieved_documents])
-            
-            # Combined score (weighted average)
-            overall_score = (
-                avg_relevance * 0.3 +           # 30% TF-IDF similarity
-                relevance_ratio * 0.4 +         # 40% relevance ratio
-                avg_vector_score * 0.3          # 30% vector search scores
+            # One array per field instead of per-document dict lookups
+            doc_count = len(retrieved_documents)
+            doc_texts = [self.preprocess_text(doc.get('text', '')) for doc in retrieved_documents]
+            vector_scores = np.fromiter(
+                (doc.get('similarity_score', 0.0) for doc in retrieved_documents), dtype=np.float64, count=doc_count
             )
             
-            return {
+            # Cosine similarity of the query to every document at once
+            similarities = self.calculate_query_similarities(query, doc_texts)
+            
+            # For Bengali text, use lower threshold and also check keyword overlap
+            keyword_overlaps = self.calculate_keyword_overlaps(query, doc_texts)
+            
+            # Consider relevant if similarity > 0.1 OR keyword overlap > 0.2 OR similarity_score from vector search > 0.5
+            relevant_mask = (similarities > 0.1) | (keyword_overlaps > 0.2) | (vector_scores > 0.5)
+            relevant_count = int(relevant_mask.sum())
+            
+            # Mean term similarity, relevance ratio and mean vector search score in one reduction,
+            # combined as a weighted average; vector search scores give credit to well-retrieved documents
+            avg_relevance, relevance_ratio, avg_vector_score = np.vstack(
+                (similarities, relevant_mask, vector_scores)
+            ).mean(axis=1)
+            overall_score = float(RELEVANCE_WEIGHTS @ (avg_relevance, relevance_ratio, avg_vector_score))
+            
+            result = {
                 "score": float(min(overall_score, 1.0)),  # Cap at 1.0
-                "analysis": f"Retrieved {relevant_count}/{len(retrieved_documents)} relevant documents. TF-IDF similarity: {avg_relevance:.3f}, Vector similarity: {avg_vector_score:.3f}",
+                "analysis": f"Retrieved {relevant_count}/{len(retrieved_documents)} relevant documents. Lexical similarity: {avg_relevance:.3f}, Vector similarity: {avg_vector_score:.3f}",
                 "relevant_docs": relevant_count,
-                "total_docs": len(retrieved_documents),
-                "individual_scores": relevance_scores
+                "total_docs": len(retrieved_documents)
             }
+            if include_individual:
+                # Serialized natively by orjson (OPT_SERIALIZE_NUMPY), no per-element Python floats
+                result["individual_scores"] = similarities
+            
+            return result
             
         except Exception as e:
             logger.error(f"Error evaluating relevance: {e}")
@@ -206,33 +426,25 @@ class RAGEvaluator:
         retrieved_documents: List[Dict[str, Any]]
     ) -> Dict[str, Any]:
         """
-        Perform comprehensive RAG evaluation using your GPT-4.1 model
+        Perform comprehensive RAG evaluation, scoring groundedness with the judge model
         Returns groundedness and relevance metrics only
         """
         try:
-            logger.info(f"Starting RAG evaluation for query: {query[:50]}... using model: {self.model}")
-            
-            # Evaluate groundedness
-            groundedness = await self.evaluate_groundedness(actual_answer, context)
+            logger.info(f"Starting RAG evaluation for query: {query[:50]}... using judge model: {self.judge_model}")
             
-            # Evaluate relevance
-            relevance = self.evaluate_relevance(query, retrieved_documents)
+            # Groundedness waits on the judge model while relevance is CPU work: run the
+            # relevance scoring in a thread so it overlaps with the API round-trip
+            groundedness, relevance = await asyncio.gather(
+                self.evaluate_groundedness(actual_answer, context),
+                asyncio.to_thread(self.evaluate_relevance, query, retrieved_documents)
+            )
             
             # Calculate overall score (weighted average of groundedness and relevance only)
             overall_score = (
                 groundedness["score"] * 0.6 +  # 60% weight for groundedness
                 relevance["score"] * 0.4       # 40% weight for relevance
             )
-            
-            # Determine overall quality
-            if overall_score >= 0.8:
-                quality = "excellent"
-            elif overall_score >= 0.6:
-                quality = "good"
-            elif overall_score >= 0.4:
-                quality = "fair"
-            else:
-                quality = "poor"
+            quality = self._quality(overall_score)
             
             result = {
                 "overall_score": float(overall_score),
@@ -241,7 +453,7 @@ class RAGEvaluator:
                 "relevance": relevance
             }
             
-            logger.info(f"RAG evaluation completed using {self.model}. Overall score: {overall_score:.3f}, Quality: {quality}")
+            logger.info(f"RAG evaluation completed using {self.judge_model}. Overall score: {overall_score:.3f}, Quality: {quality}")
             
             return result
             
@@ -251,4 +463,197 @@ class RAGEvaluator:
                 "overall_score": 0.0,
                 "quality": "error",
                 "error": str(e)
-            }
\ No newline at end of file
+            }
+    async def comprehensive_evaluation_fast(
+        self,
+        query: str,
+        retrieved_documents: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Online part of a deferred evaluation: relevance only, no judge call.
+        Groundedness is queued with enqueue_for_groundedness and scored later by flush_groundedness_queue
+        """
+        try:
+            relevance = await asyncio.to_thread(self.evaluate_relevance, query, retrieved_documents)
+            overall_score = relevance["score"]
+            
+            return {
+                "overall_score": float(overall_score),
+                "quality": self._quality(overall_score),
+                "groundedness": None,
+                "relevance": relevance
+            }
+            
+        except Exception as e:
+            logger.error(f"Error in fast RAG evaluation: {e}")
+            return {
+                "overall_score": 0.0,
+                "quality": "error",
+                "error": str(e)
+            }
+    
+    @staticmethod
+    def _quality(overall_score: float) -> str:
+        """Quality label of an overall evaluation score"""
+        if overall_score >= 0.8:
+            return "excellent"
+        if overall_score >= 0.6:
+            return "good"
+        if overall_score >= 0.4:
+            return "fair"
+        return "poor"
+    
+    @staticmethod
+    def _groundedness_results():
+        return get_db()[GROUNDEDNESS_RESULTS_COLLECTION]
+    
+    async def ensure_indexes(self):
+        """Create the index the flush uses to find pending judgments"""
+        try:
+            await self._groundedness_results().create_index([("status", 1), ("created_at", 1)])
+            logger.info("groundedness_results status/created_at index ensured")
+        except Exception as e:
+            logger.error("Failed to create groundedness_results index: %s", e)
+    
+    async def enqueue_for_groundedness(self, evaluation_id: str, answer: str, context: str):
+        """Queue the groundedness judgment of an answer for the next flush"""
+        await self._groundedness_results().insert_one({
+            "_id": evaluation_id,
+            "status": "pending",
+            "answer": answer,
+            "context": context,
+            "created_at": datetime.utcnow()
+        })
+    
+    async def flush_groundedness_queue(self, limit: int = GROUNDEDNESS_FLUSH_LIMIT) -> Dict[str, int]:
+        """
+        Store the results of Batch API jobs submitted by earlier flushes, then take the oldest
+        pending groundedness judgments: with use_batch_api they are submitted as one batch
+        (its id is stored with them, a later flush collects it), otherwise scored right away.
+        Meant to be triggered periodically, e.g. nightly by cron.
+        Returns the number of judgments stored ("scored") and submitted to a batch ("submitted")
+        """
+        collection = self._groundedness_results()
+        scored = await self._collect_submitted_batches(collection)
+        
+        pending = await self._claim_pending(collection, limit)
+        if not pending:
+            return {"scored": scored, "submitted": 0}
+        
+        logger.info(f"Scoring {len(pending)} deferred groundedness judgments")
+        
+        if not self.config.use_batch_api:
+            results = await self.evaluate_groundedness_many([(doc["answer"], doc["context"]) for doc in pending])
+            await self._store_groundedness(collection, [(doc["_id"], result) for doc, result in zip(pending, results)])
+            return {"scored": scored + len(pending), "submitted": 0}
+        
+        # Judgments known without the judge model are stored now, the rest go to one batch
+        known = []
+        to_submit = {}
+        for doc in pending:
+            result = self._immediate_groundedness(doc["answer"], doc["context"])
+            if result is not None:
+                known.append((doc["_id"], result))
+            else:
+                to_submit[doc["_id"]] = (doc["answer"], doc["context"])
+        
+        await self._store_groundedness(collection, known)
+        
+        if to_submit:
+            batch_id = await self.submit_groundedness_batch(to_submit)
+            await collection.update_many(
+                {"_id": {"$in": list(to_submit)}},
+                {"$set": {"status": "submitted", "batch_id": batch_id, "submitted_at": datetime.utcnow()},
+                 "$unset": {"claim": "", "claimed_at": ""}}
+            )
+        
+        return {"scored": scored + len(known), "submitted": len(to_submit)}
+    
+    @staticmethod
+    async def _claim_pending(collection, limit: int) -> List[Dict[str, Any]]:
+        """
+        Claim the oldest pending judgments for this flush (status "processing" with a claim token),
+        so concurrent flushes never judge, and bill, the same evaluation twice
+        """
+        now = datetime.utcnow()
+        
+        # Judgments left claimed by a flush that was killed before storing or submitting them
+        await collection.update_many(
+            {"status": "processing", "claimed_at": {"$lt": now - GROUNDEDNESS_CLAIM_TIMEOUT}},
+            {"$set": {"status": "pending"}, "$unset": {"claim": "", "claimed_at": ""}}
+        )
+        
+        candidates = await collection.find(
+            {"status": "pending"},
+            {"_id": 1}
+        ).sort("created_at", 1).to_list(length=limit)
+        if not candidates:
+            return []
+        
+        # The status condition makes each claim atomic: a judgment taken by another flush
+        # in the meantime is no longer pending and stays with that flush
+        claim = uuid.uuid4().hex
+        await collection.update_many(
+            {"_id": {"$in": [doc["_id"] for doc in candidates]}, "status": "pending"},
+            {"$set": {"status": "processing", "claim": claim, "claimed_at": now}}
+        )
+        
+        return await collection.find(
+            {"claim": claim},
+            {"answer": 1, "context": 1}
+        ).to_list(length=None)
+    
+    async def _collect_submitted_batches(self, collection) -> int:
+        """Store the results of the submitted batches that have finished; returns the number stored"""
+        stored = 0
+        
+        for batch_id in await collection.distinct("batch_id", {"status": "submitted"}):
+            try:
+                results = await self.collect_groundedness_batch(batch_id)
+            except Exception as e:
+                logger.error(f"Failed to collect groundedness batch {batch_id}: {e}")
+                continue
+            
+            if results is None:
+                continue
+            
+            evaluation_ids = await collection.distinct("_id", {"status": "submitted", "batch_id": batch_id})
+            await self._store_groundedness(collection, [
+                (evaluation_id, results.get(evaluation_id) or {
+                    "score": 0.0,
+                    "analysis": "Error in evaluation: no batch result",
+                    "supported": False
+                })
+                for evaluation_id in evaluation_ids
+            ])
+            stored += len(evaluation_ids)
+        
+        return stored
+    
+    @staticmethod
+    async def _store_groundedness(collection, results: List[Tuple[str, Dict[str, Any]]]):
+        """Store groundedness results by evaluation id, marking the judgments done"""
+        if not results:
+            return
+        
+        now = datetime.utcnow()
+        await collection.bulk_write([
+            UpdateOne(
+                {"_id": evaluation_id},
+                # The inputs are not needed once scored
+                {"$set": {"status": "done", "groundedness": result, "evaluated_at": now},
+                 "$unset": {"answer": "", "context": "", "batch_id": "", "claim": "", "claimed_at": ""}}
+            )
+            for evaluation_id, result in results
+        ], ordered=False)
+    
+    async def get_deferred_groundedness(self, evaluation_id: str) -> Optional[Dict[str, Any]]:
+        """Status and, once scored, groundedness result of a deferred evaluation (None if unknown)"""
+        return await self._groundedness_results().find_one(
+            {"_id": evaluation_id},
+            {"_id": 0, "status": 1, "groundedness": 1, "created_at": 1, "evaluated_at": 1}
+        )
+    
+    async def close(self):
+        """Release the judge HTTP client's connections"""
+        await self._http.aclose()
@@ -1,10 +1,17 @@
 # gunicorn_config.py
+import os
+
 bind = "0.0.0.0:8000"
-workers = 2  # Reduce workers to save memory
+# Reduce workers to save memory; with preload_app the imported libraries are shared copy-on-write,
+# so raise WEB_CONCURRENCY (up to 2 * CPUs + 1) where the per-worker caches fit in memory
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# Runs on uvloop with the httptools parser (picked automatically, installed by uvicorn[standard]);
+# async workers handle concurrency on the event loop, so no threads
 worker_class = "uvicorn.workers.UvicornWorker"
 
 # Timeout settings for long-running operations
-timeout = 10000  # 5 minutes for worker timeout
+timeout = 300  # 5 minutes for worker timeout
+graceful_timeout = 30
 keepalive = 5
 max_requests = 100
 max_requests_jitter = 10